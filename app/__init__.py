@@ -1,16 +1,45 @@
-from flask import Flask
+from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
+from app.utils.http import create_genieacs_session
+from app.utils.circuit import create_circuit_breaker
+from app.utils.cache import create_inventory_cache
+from app.utils.changes import create_removal_log
+from app.utils.events import create_event_hub, sse_supported
+from app.utils.history import create_status_history
+from app.utils.search import create_search_index
+from app.utils.metrics import init_metrics
+from app.utils.compression import init_compression
+from app.utils.conditional import create_fragment_cache
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config['GENIEACS_SESSION'] = create_genieacs_session(app.config)
+    app.config['GENIEACS_CIRCUIT'] = create_circuit_breaker(app)
+    app.config['INVENTORY_CACHE'] = create_inventory_cache(app.config)
+    app.config['DEVICE_REMOVAL_LOG'] = create_removal_log(app.config)
+    app.config['DEVICE_HISTORY'] = create_status_history(app.config)
+    app.config['DEVICE_EVENT_HUB'] = create_event_hub(app)
+    app.config['DEVICE_SEARCH_INDEX'] = create_search_index(app.config)
+    app.config['METRICS'] = init_metrics(app)
+    app.config['FRAGMENT_CACHE'] = create_fragment_cache(app.config)
+    init_compression(app)
 
     db.init_app(app)
+    if app.config['SQLITE_WAL'] and app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        with app.app_context():
+            db.event.listen(db.engine, 'connect', _enable_sqlite_wal)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
 
@@ -28,9 +57,42 @@ def create_app():
         except:
             return str(value)
 
-    from app.routes import main, auth, devices
+    @app.context_processor
+    def device_events_context():
+        # 页面据此选择 SSE 推送或定时轮询
+        return {'device_events_sse': app.config['DEVICE_EVENTS_SSE'] and sse_supported(request.environ),
+                'device_events_poll_interval': app.config['DEVICE_EVENTS_POLL_INTERVAL']}
+
+    if app.config['DEVICE_EVENTS_SSE']:
+        @app.before_first_request
+        def check_sse_worker():
+            if not sse_supported(request.environ):
+                app.logger.warning("Worker cannot hold concurrent connections (e.g. gunicorn sync worker), "
+                                   "device events fall back to polling; use --worker-class gthread or gevent")
+
+    if app.config['DEVICE_SYNC_INTERVAL'] > 0:
+        @app.before_first_request
+        def start_device_sync():
+            from app.utils.device_sync import start_sync_thread
+            start_sync_thread(app)
+
+    @app.before_first_request
+    def start_device_watcher():
+        # 删除扫描和状态历史都由 watcher 线程在后台执行
+        app.config['DEVICE_EVENT_HUB'].start()
+
+    from app.utils.bulk import create_bulk_runner
+    app.config['BULK_TASK_RUNNER'] = create_bulk_runner(app)
+
+    @app.before_first_request
+    def start_bulk_runner():
+        # 认领上次进程退出时未执行完的批量任务
+        app.config['BULK_TASK_RUNNER'].start()
+
+    from app.routes import main, auth, devices, bulk
     app.register_blueprint(main.bp)
     app.register_blueprint(auth.bp)
     app.register_blueprint(devices.bp)
+    app.register_blueprint(bulk.bp)
 
     return app 
\ No newline at end of file
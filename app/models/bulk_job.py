@@ -0,0 +1,62 @@
+from app import db
+from datetime import datetime
+import json
+
+class BulkJob(db.Model):
+    """批量设备操作任务"""
+    id = db.Column(db.Integer, primary_key=True)
+    action = db.Column(db.String(32), nullable=False)
+    # set_parameter 的参数名和值，JSON 格式
+    arguments = db.Column(db.Text)
+    # 创建任务时使用的 GenieACS 查询，JSON 格式，按 ID 列表创建时为空
+    device_query = db.Column(db.Text)
+    status = db.Column(db.String(20), default='pending', index=True)
+    total = db.Column(db.Integer, default=0)
+    succeeded = db.Column(db.Integer, default=0)
+    failed = db.Column(db.Integer, default=0)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # 执行中的任务定期刷新，超过 BULK_STALE_TIMEOUT 未刷新视为执行进程已退出
+    heartbeat_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'action': self.action,
+            'arguments': json.loads(self.arguments) if self.arguments else None,
+            'query': json.loads(self.device_query) if self.device_query else None,
+            'status': self.status,
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'pending': max(0, (self.total or 0) - (self.succeeded or 0) - (self.failed or 0)),
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'error': self.error
+        }
+
+class BulkJobItem(db.Model):
+    """批量任务中单台设备的执行状态"""
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('bulk_job.id'), nullable=False)
+    device_id = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), default='pending')
+    result = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_bulk_job_item_job_status', 'job_id', 'status'),
+    )
+
+    def to_dict(self):
+        return {
+            'device_id': self.device_id,
+            'status': self.status,
+            'result': self.result,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,26 +1,82 @@
 from app import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from app.utils.normalize import (ONLINE_THRESHOLD_SECONDS, STATUS_ONLINE, STATUS_OFFLINE,
+                                 format_local)
 
 class Device(db.Model):
+    """GenieACS 设备清单的本地镜像，由 sync-devices 增量同步写入"""
     id = db.Column(db.Integer, primary_key=True)
     device_id = db.Column(db.String(64), unique=True, nullable=False)
-    manufacturer = db.Column(db.String(64))
-    model = db.Column(db.String(64))
+    manufacturer = db.Column(db.String(64), index=True)
+    model = db.Column(db.String(64), index=True)
+    oui = db.Column(db.String(16))
+    serial_number = db.Column(db.String(64), index=True)
     firmware_version = db.Column(db.String(64))
-    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    # GenieACS 的 _lastInform（UTC）
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # GenieACS 的 _registered（UTC）
+    registered = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='offline')
     ip_address = db.Column(db.String(45))
     mac_address = db.Column(db.String(17))
-    
+
+    @classmethod
+    def filtered(cls, status=None, manufacturer=None, product_class=None, q=None, now=None):
+        """按与 NBI 查询相同的筛选条件构造本地查询，在线状态由 last_seen 实时判定"""
+        query = cls.query
+        if q:
+            pattern = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.filter(db.or_(cls.device_id.like(pattern + '%', escape='\\'),
+                                        cls.serial_number.like(pattern + '%', escape='\\'),
+                                        cls.manufacturer.like(pattern + '%', escape='\\'),
+                                        cls.model.like(pattern + '%', escape='\\')))
+        if manufacturer:
+            query = query.filter(cls.manufacturer == manufacturer)
+        if product_class:
+            query = query.filter(cls.model == product_class)
+        if status in ('online', 'offline'):
+            threshold = (now or datetime.utcnow()) - timedelta(seconds=ONLINE_THRESHOLD_SECONDS)
+            if status == 'online':
+                query = query.filter(cls.last_seen > threshold)
+            else:
+                query = query.filter(cls.last_seen <= threshold)
+        return query
+
+    def to_genieacs(self, now=None):
+        """转换为与 GenieACS 标准化设备相同结构的字典，供模板和 API 直接复用
+
+        与 NBI 一致，没有值的字段不出现在结果中。
+        """
+        device = {
+            '_id': self.device_id,
+            '_deviceId': {
+                '_Manufacturer': self.manufacturer,
+                '_OUI': self.oui,
+                '_ProductClass': self.model,
+                '_SerialNumber': self.serial_number,
+            },
+        }
+        device['_deviceId'] = {key: value for key, value in device['_deviceId'].items() if value is not None}
+        if self.registered:
+            device['_registered'] = format_local(self.registered)
+        if self.last_seen:
+            seconds_diff = ((now or datetime.utcnow()) - self.last_seen).total_seconds()
+            device['_lastInform'] = format_local(self.last_seen)
+            device['_deviceStatus'] = STATUS_ONLINE if seconds_diff <= ONLINE_THRESHOLD_SECONDS else STATUS_OFFLINE
+        return device
+
     def to_dict(self):
         return {
             'id': self.id,
             'device_id': self.device_id,
             'manufacturer': self.manufacturer,
             'model': self.model,
+            'oui': self.oui,
+            'serial_number': self.serial_number,
             'firmware_version': self.firmware_version,
             'last_seen': self.last_seen.isoformat() if self.last_seen else None,
+            'registered': self.registered.isoformat() if self.registered else None,
             'status': self.status,
             'ip_address': self.ip_address,
             'mac_address': self.mac_address
-        } 
\ No newline at end of file
+        }
@@ -1,6 +1,10 @@
 from app import db, login_manager
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy.orm import make_transient_to_detached
 from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+import time
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -15,6 +19,42 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+# load_user 的进程内缓存：用户 ID -> (过期时间, 列值)
+# 用户被修改或删除时立即失效，其他进程中的副本最多保留 USER_CACHE_TTL 秒
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+def _user_columns(user):
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+def invalidate_user(user_id):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    invalidate_user(target.id)
+
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id)) 
\ No newline at end of file
+    user_id = int(id)
+    ttl = current_app.config['USER_CACHE_TTL']
+    if ttl <= 0:
+        return User.query.get(user_id)
+
+    now = time.monotonic()
+    cached = _user_cache.get(user_id)
+    if cached is None or cached[0] < now:
+        user = User.query.get(user_id)
+        if user is None:
+            invalidate_user(user_id)
+            return None
+        cached = (now + ttl, _user_columns(user))
+        with _user_cache_lock:
+            _user_cache[user_id] = cached
+
+    # 每个请求返回独立的 detached 实例，不与会话共享，需要修改时先 db.session.merge
+    user = User(**cached[1])
+    make_transient_to_detached(user)
+    return user
@@ -40,11 +40,13 @@ def register():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        if User.query.filter_by(username=username).first():
+        # 用户名和邮箱的重复检查合并为一次索引查询
+        existing = User.query.filter(db.or_(User.username == username, User.email == email)).first()
+        if existing is not None and existing.username == username:
             flash('Username already exists')
             return redirect(url_for('auth.register'))
         
-        if User.query.filter_by(email=email).first():
+        if existing is not None:
             flash('Email already exists')
             return redirect(url_for('auth.register'))
         
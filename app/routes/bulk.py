@@ -0,0 +1,87 @@
+from flask import Blueprint, jsonify, request, current_app
+from flask_login import login_required, current_user
+from app.models.bulk_job import BulkJob, BulkJobItem
+from app.utils.bulk import create_job, cancel_job
+from app.utils.genieacs import build_device_query
+
+bp = Blueprint('bulk', __name__)
+
+# 任务详情中最多返回的失败设备数
+FAILED_ITEMS_LIMIT = 100
+
+def _forbidden():
+    return jsonify({'success': False, 'error': '需要管理员权限'}), 403
+
+@bp.route('/api/bulk-jobs', methods=['POST'])
+@login_required
+def create_bulk_job():
+    """创建批量任务：device_ids 为设备 ID 列表，或以 query / 筛选条件选择设备
+
+    查询和筛选条件均为空时需显式指定 "all": true 才会对全部设备执行。
+    """
+    if not current_user.is_admin:
+        return _forbidden()
+
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    device_ids = data.get('device_ids')
+    query = data.get('query')
+    all_devices = data.get('all') is True
+    if device_ids is None and query is None:
+        filters = data.get('filters') or {}
+        query = build_device_query(filters.get('status'), filters.get('manufacturer'),
+                                   filters.get('product_class'), filters.get('q'))
+    if device_ids is not None and not isinstance(device_ids, list):
+        return jsonify({'success': False, 'error': 'device_ids 必须是列表'}), 400
+    if query is not None and not isinstance(query, dict):
+        return jsonify({'success': False, 'error': 'query 必须是对象'}), 400
+
+    arguments = None
+    if action == 'set_parameter':
+        arguments = {'parameter': data.get('parameter'), 'value': data.get('value')}
+
+    try:
+        job = create_job(action, device_ids=device_ids, query=query, arguments=arguments, user_id=current_user.id,
+                         all_devices=all_devices)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error creating bulk job: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 502
+
+    if job.status == 'pending':
+        current_app.config['BULK_TASK_RUNNER'].submit(job.id)
+    return jsonify({'success': True, 'job': job.to_dict()}), 202
+
+@bp.route('/api/bulk-jobs')
+@login_required
+def list_bulk_jobs():
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    jobs = BulkJob.query.order_by(BulkJob.id.desc()).limit(limit).all()
+    return jsonify({'success': True, 'jobs': [job.to_dict() for job in jobs]})
+
+@bp.route('/api/bulk-jobs/<int:job_id>')
+@login_required
+def get_bulk_job(job_id):
+    job = BulkJob.query.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+
+    result = job.to_dict()
+    if request.args.get('items') == 'failed':
+        items = BulkJobItem.query.filter_by(job_id=job_id, status='failed') \
+            .order_by(BulkJobItem.id).limit(FAILED_ITEMS_LIMIT).all()
+        result['failed_items'] = [item.to_dict() for item in items]
+    return jsonify({'success': True, 'job': result})
+
+@bp.route('/api/bulk-jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_bulk_job(job_id):
+    if not current_user.is_admin:
+        return _forbidden()
+    job = BulkJob.query.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+    if not cancel_job(job):
+        return jsonify({'success': False, 'error': f'任务已{job.status}，无法取消'}), 409
+    return jsonify({'success': True, 'job': job.to_dict()})
@@ -1,47 +1,82 @@
-from flask import Blueprint, render_template, jsonify, request, flash
-from flask_login import login_required
-from app.utils.genieacs import GenieACS
+from flask import (Blueprint, render_template, jsonify, request, flash, Response, stream_with_context, make_response,
+                   session)
+from flask_login import login_required, current_user
+from markupsafe import Markup
+from app.utils.genieacs import GenieACS, build_device_query
+from app.utils.pagination import get_device_list_args, fetch_device_page
+from app.utils.changes import get_device_changes
+from app.utils.events import iter_sse, sse_supported
+from app.utils.stats import AGE_BUCKETS, get_device_stats, get_recent_devices
+from app.utils.conditional import inventory_tag, request_args_key, not_modified, with_etag, cached_fragment
+from app.utils.export import DEFAULT_EXPORT_FIELDS, EXPORT_MIMETYPES, export_devices
+from app.utils.search import search_nbi
+from app.utils.normalize import format_local, STATUS_ONLINE, STATUS_OFFLINE, STATUS_UNKNOWN
 from flask import current_app
+from datetime import datetime
 import json
+import time
 
 bp = Blueprint('devices', __name__)
 
 @bp.route('/devices')
 @login_required
 def device_list():
+    """设备列表页
+
+    清单版本未变时对 If-None-Match 返回 304；表格行按清单版本和查询参数缓存渲染结果。
+    """
+    args = get_device_list_args()
     try:
         genieacs = GenieACS()
-        devices = genieacs.get_devices()
-        if not devices:
+        tag = inventory_tag(genieacs, 'devices', request_args_key())
+        # 整页包含当前用户和 flash 消息：ETag 区分用户，有待显示的消息时不返回 304
+        etag = f"{tag}-{current_user.get_id()}" if tag else None
+        if '_flashes' not in session:
+            response = not_modified(etag)
+            if response is not None:
+                return response
+
+        def build():
+            devices, pagination = fetch_device_page(genieacs, args)
+            return {'rows': render_template('devices/_device_rows.html', devices=devices),
+                    'count': len(devices),
+                    'pagination': pagination}
+
+        page = cached_fragment(genieacs, 'device_rows', tag, build)
+        stale = genieacs.stale_fields()
+        if stale['stale']:
+            etag = None
+            flash(f"GenieACS 暂时不可用，当前显示的是 {stale['stale_since']} 获取的缓存数据", 'warning')
+        elif not page['count']:
             current_app.logger.warning("没有找到任何设备")
             flash('当前没有可用的设备', 'info')
-        return render_template('devices/list.html', devices=devices)
+        return with_etag(make_response(render_template('devices/list.html',
+                                                       device_rows=Markup(page['rows']) if page['count'] else None,
+                                                       pagination=page['pagination'])),
+                         etag)
     except Exception as e:
         current_app.logger.error(f"获取设备列表失败: {str(e)}")
         flash('获取设备列表时发生错误，请检查 GenieACS 服务是否正常运行', 'error')
-        return render_template('devices/list.html', devices=[])
+        return render_template('devices/list.html', device_rows=None, pagination=None)
 
 @bp.route('/devices/<device_id>')
 @login_required
 def device_detail(device_id):
     try:
-        current_app.logger.info(f"Accessing device detail page for device_id: {device_id}")
-        
         genieacs = GenieACS()
-        device = genieacs.get_device(device_id)
+        device, parameters = genieacs.get_device_detail(device_id)
         
         if not device:
-            current_app.logger.error(f"设备不存在或获取失败: {device_id}")
+            current_app.logger.error(f"设备不存在: {device_id}")
             flash('设备不存在或已被删除', 'error')
             return render_template('devices/detail.html', device=None, parameters=[])
             
-        current_app.logger.info(f"Successfully retrieved device: {json.dumps(device, ensure_ascii=False)}")
-        
-        parameters = genieacs.get_device_parameters(device_id)
         if not parameters:
             current_app.logger.warning(f"设备 {device_id} 没有可用的参数")
-        else:
-            current_app.logger.info(f"Retrieved {len(parameters)} parameters for device")
+
+        stale = genieacs.stale_fields()
+        if stale['stale']:
+            flash(f"GenieACS 暂时不可用，当前显示的是 {stale['stale_since']} 获取的缓存数据", 'warning')
             
         return render_template('devices/detail.html', 
                              device=device, 
@@ -65,6 +100,36 @@ def factory_reset(device_id):
     result = genieacs.factory_reset(device_id)
     return jsonify(result)
 
+@bp.route('/devices/<device_id>/parameters', methods=['GET'])
+@login_required
+def get_parameters(device_id):
+    """按需获取设备参数子树
+
+    prefix 为点分参数路径（为空时从根开始），depth 为相对 prefix 的展开层数，默认只展开一层。
+    """
+    prefix = request.args.get('prefix', '').strip('.')
+    depth = request.args.get('depth', 1, type=int)
+    genieacs = GenieACS()
+    try:
+        parameters = genieacs.get_device_parameters(device_id, prefix=prefix, depth=depth)
+    except Exception as e:
+        current_app.logger.error(f"获取设备参数失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 502
+    if parameters is None:
+        return jsonify({
+            'success': False,
+            'error': '设备不存在'
+        }), 404
+    return jsonify({
+        'success': True,
+        'prefix': prefix,
+        'parameters': parameters,
+        **genieacs.stale_fields()
+    })
+
 @bp.route('/devices/<device_id>/parameters', methods=['POST'])
 @login_required
 def set_parameter(device_id):
@@ -74,19 +139,296 @@ def set_parameter(device_id):
     result = genieacs.set_parameter(device_id, parameter, value)
     return jsonify(result)
 
+def _stream_devices_ndjson(args):
+    """以 NDJSON 逐行输出设备，出错时以一行 error 记录结束"""
+    genieacs = GenieACS()
+    # 显式指定了分页参数时才分页，否则流式输出全部匹配设备
+    paged = 'page' in request.args or 'limit' in request.args
+
+    def generate():
+        try:
+            for device in genieacs.iter_devices(query=args['query'],
+                                                projection=args['projection'],
+                                                skip=args['skip'] if paged else None,
+                                                limit=args['limit'] if paged else None,
+                                                sort={'_id': 1}):
+                yield json.dumps(device, ensure_ascii=False) + '\n'
+        except Exception as e:
+            current_app.logger.error(f"流式输出设备列表失败: {str(e)}")
+            yield json.dumps({'error': str(e)}, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @bp.route('/api/devices')
 def get_devices_api():
-    """获取设备列表的API端点"""
+    """获取设备列表的API端点
+
+    支持 page/limit 分页、status/manufacturer/product_class 筛选、q 关键字前缀搜索以及 fields 字段投影。
+    stream=1 时以分块 NDJSON 流式返回，每行一个设备。
+    GenieACS 不可用时返回最后一次成功的结果，并带 stale/stale_since 标记。
+    清单版本未变时对 If-None-Match 返回 304，响应体按清单版本和查询参数缓存。
+    """
+    if request.args.get('stream') in ('1', 'true'):
+        return _stream_devices_ndjson(get_device_list_args())
+
+    try:
+        args = get_device_list_args()
+        genieacs = GenieACS()
+        tag = inventory_tag(genieacs, 'api_devices', request_args_key())
+        response = not_modified(tag)
+        if response is not None:
+            return response
+
+        def build():
+            devices, pagination = fetch_device_page(genieacs, args)
+            return jsonify({
+                'success': True,
+                'devices': devices,
+                'pagination': pagination,
+                **genieacs.stale_fields()
+            }).get_data(as_text=True)
+
+        body = cached_fragment(genieacs, 'api_devices', tag, build)
+        response = current_app.response_class(body, mimetype='application/json')
+        return with_etag(response, tag if genieacs.stale_since is None else None)
+    except Exception as e:
+        current_app.logger.error(f"获取设备列表失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/devices/export')
+@login_required
+def export_devices_api():
+    """流式导出设备清单
+
+    format 为 csv、ndjson 或 parquet（需要 pyarrow），fields 为逗号分隔的字段或参数路径，
+    支持与列表相同的 status/manufacturer/product_class/q 筛选。按页遍历 NBI，内存占用与设备总数无关。
+    """
+    fmt = request.args.get('format', 'csv')
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or DEFAULT_EXPORT_FIELDS
+    query = build_device_query(status=request.args.get('status', '').strip() or None,
+                               manufacturer=request.args.get('manufacturer', '').strip() or None,
+                               product_class=request.args.get('product_class', '').strip() or None,
+                               q=request.args.get('q', '').strip() or None)
+    try:
+        chunks = export_devices(GenieACS(), fmt, fields, query)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    def generate():
+        try:
+            yield from chunks
+        except Exception as e:
+            # 响应头已发出，只能记录日志并提前结束，客户端得到的文件不完整
+            current_app.logger.error(f"导出设备清单失败: {str(e)}")
+
+    filename = f"devices-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    return Response(stream_with_context(generate()),
+                    mimetype=EXPORT_MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@bp.route('/api/devices/<device_id>/raw')
+@login_required
+def get_device_raw_api(device_id):
+    """按需返回单个设备的原始 NBI 文档，供列表页查看调试数据"""
+    try:
+        device = GenieACS().get_raw_device(device_id)
+    except Exception as e:
+        current_app.logger.error(f"获取设备原始数据失败: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 502
+    if device is None:
+        return jsonify({'success': False, 'error': '设备不存在'}), 404
+    return jsonify({'success': True, 'device': device})
+
+@bp.route('/api/devices/search')
+@login_required
+def search_devices_api():
+    """按设备 ID、序列号、OUI、型号或制造商的片段搜索设备，使用进程内索引
+
+    索引在后台构建，完成前按前缀查询 NBI，响应中 index_ready 为 false。
+    """
+    q = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    index = current_app.config['DEVICE_SEARCH_INDEX']
+    index.refresh_in_background(current_app._get_current_object())
+
+    started = time.perf_counter()
+    genieacs = GenieACS()
+    index_ready = index.ready
+    if index_ready:
+        results = index.search(q, limit)
+    else:
+        try:
+            results = search_nbi(genieacs, q, limit)
+        except Exception as e:
+            current_app.logger.error(f"搜索设备失败: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 502
+    return jsonify({
+        'success': True,
+        'devices': [{
+            '_id': device_id,
+            'serial_number': serial_number,
+            'oui': oui,
+            'product_class': product_class,
+            'manufacturer': manufacturer,
+        } for device_id, serial_number, oui, product_class, manufacturer in results],
+        'index_ready': index_ready,
+        'took_ms': round((time.perf_counter() - started) * 1000, 3),
+        **genieacs.stale_fields()
+    })
+
+@bp.route('/api/devices/stats')
+@login_required
+def get_device_stats_api():
+    """设备统计API端点
+
+    返回总数、在线/离线数、按厂商和型号的分布以及最后 Inform 距今时长直方图。
+    buckets 为逗号分隔的直方图分桶上界（秒），top 限制分布项数，recent=N 时附带最近 Inform 的 N 台设备。
+    """
+    try:
+        buckets = AGE_BUCKETS
+        if request.args.get('buckets'):
+            buckets = tuple(sorted({int(b) for b in request.args['buckets'].split(',') if b.strip()}))
+        top = min(max(request.args.get('top', 10, type=int), 1), 100)
+        recent = min(max(request.args.get('recent', 0, type=int), 0), 50)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'buckets 必须是逗号分隔的整数'}), 400
+
     try:
         genieacs = GenieACS()
-        devices = genieacs.get_devices()
+        tag = inventory_tag(genieacs, 'stats', request_args_key())
+        response = not_modified(tag)
+        if response is not None:
+            return response
+
+        stats = get_device_stats(genieacs, buckets, top)
+        if recent:
+            stats['recent_devices'] = get_recent_devices(genieacs, recent)
+        response = jsonify({
+            'success': True,
+            **stats,
+            **genieacs.stale_fields()
+        })
+        return with_etag(response, tag if genieacs.stale_since is None else None)
+    except Exception as e:
+        current_app.logger.error(f"获取设备统计失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _history_window():
+    """返回 (状态历史, since, now)；未开启状态历史时状态历史为 None"""
+    hours = min(max(request.args.get('hours', 24, type=float), 0), 24 * 30)
+    now = int(time.time())
+    return current_app.config['DEVICE_HISTORY'], now - int(hours * 3600), now
+
+def _history_time(timestamp):
+    return format_local(datetime.utcfromtimestamp(timestamp))
+
+_HISTORY_DISABLED = {'success': False, 'error': '未开启设备状态历史（DEVICE_HISTORY_ENABLED）'}
+
+@bp.route('/api/devices/<device_id>/history')
+@login_required
+def get_device_history_api(device_id):
+    """单台设备的在线/离线历史
+
+    hours 为时间窗口（默认 24 小时），返回窗口内的状态变化、Inform 时间和可用率（0~1）。
+    """
+    history, since, now = _history_window()
+    if history is None:
+        return jsonify(_HISTORY_DISABLED), 404
+    result = history.device_history(device_id, since, now)
+    if result is None:
+        return jsonify({'success': False, 'error': '没有该设备的状态历史'}), 404
+    return jsonify({
+        'success': True,
+        'device_id': device_id,
+        'since': _history_time(result['since']),
+        'status': {1: STATUS_ONLINE, 0: STATUS_OFFLINE}.get(result['state'], STATUS_UNKNOWN),
+        'availability': result['availability'],
+        'transitions': [{'time': _history_time(changed_at), 'status': STATUS_ONLINE if online else STATUS_OFFLINE}
+                        for changed_at, online in result['transitions']],
+        'informs': [_history_time(inform) for inform in result['informs']],
+    })
+
+@bp.route('/api/devices/history/flapping')
+@login_required
+def get_flapping_devices_api():
+    """hours 小时内状态变化不少于 min 次（默认 4）的设备，按变化次数倒序，最多 limit 台"""
+    history, since, now = _history_window()
+    if history is None:
+        return jsonify(_HISTORY_DISABLED), 404
+    min_transitions = max(request.args.get('min', 4, type=int), 1)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 1000)
+    started = time.perf_counter()
+    since, devices = history.flapping(since, min_transitions, limit)
+    return jsonify({
+        'success': True,
+        'since': _history_time(since),
+        'devices': [{'_id': device_id, 'transitions': count} for device_id, count in devices],
+        'took_ms': round((time.perf_counter() - started) * 1000, 3),
+    })
+
+@bp.route('/api/devices/history/availability')
+@login_required
+def get_fleet_availability_api():
+    """hours 小时内的全网可用率，以及期间状态有变化的设备中可用率最低的 limit 台"""
+    history, since, now = _history_window()
+    if history is None:
+        return jsonify(_HISTORY_DISABLED), 404
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 1000)
+    started = time.perf_counter()
+    result = history.availability(since, now, limit)
+    return jsonify({
+        'success': True,
+        'since': _history_time(result['since']),
+        'devices': result['devices'],
+        'availability': result['availability'],
+        'always_online': result['always_online'],
+        'always_offline': result['always_offline'],
+        'least_available': [{'_id': device_id, 'availability': ratio, 'transitions': transitions}
+                            for device_id, ratio, transitions in result['unstable']],
+        'took_ms': round((time.perf_counter() - started) * 1000, 3),
+    })
+
+@bp.route('/api/devices/changes')
+@login_required
+def get_device_changes_api():
+    """设备增量变化API端点
+
+    返回自 since 游标以来状态或最后在线时间变化的设备、已删除的设备 ID 以及新的游标。
+    reset 为 true 时表示游标缺失或过旧，客户端需要重新全量加载。
+    """
+    try:
+        genieacs = GenieACS()
+        changes = get_device_changes(genieacs, request.args.get('since', type=int))
         return jsonify({
             'success': True,
-            'devices': devices
+            **changes
         })
     except Exception as e:
-        current_app.logger.error(f"获取设备列表失败: {str(e)}")
+        current_app.logger.error(f"获取设备变化失败: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@bp.route('/api/devices/events')
+@login_required
+def device_events():
+    """设备状态变化的 Server-Sent Events 推送
+
+    所有连接共享同一个进程级 watcher，事件类型包括 online、offline、registered、rebooted、removed，
+    收到 reset 时客户端应重新全量加载。worker 不支持并发连接或关闭了 DEVICE_EVENTS_SSE 时返回 503，
+    客户端应改为轮询 /api/devices/changes。
+    """
+    if not current_app.config['DEVICE_EVENTS_SSE'] or not sse_supported(request.environ):
+        return jsonify({'success': False, 'error': 'SSE 不可用，请轮询 /api/devices/changes'}), 503
+    hub = current_app.config['DEVICE_EVENT_HUB']
+    keepalive = current_app.config['DEVICE_EVENTS_KEEPALIVE']
+    return Response(iter_sse(hub, keepalive),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, current_app, Response, abort, flash
 from flask_login import login_required
 from app.utils.genieacs import GenieACS
+from app.utils.pagination import get_device_list_args, fetch_device_page
 from datetime import datetime, timedelta
 
 bp = Blueprint('main', __name__)
@@ -8,10 +9,8 @@ bp = Blueprint('main', __name__)
 @bp.route('/')
 @login_required
 def index():
-    genieacs = GenieACS()
-    devices = genieacs.get_devices()
-    return render_template('index.html', 
-                         devices=devices,
+    # 概览数据由页面通过 /api/devices/stats 获取，这里不再查询设备列表
+    return render_template('index.html',
                          now=datetime.utcnow(),
                          timedelta=timedelta)
 
@@ -19,8 +18,20 @@ def index():
 @login_required
 def dashboard():
     genieacs = GenieACS()
-    devices = genieacs.get_devices()
+    devices, pagination = fetch_device_page(genieacs, get_device_list_args())
+    stale = genieacs.stale_fields()
+    if stale['stale']:
+        flash(f"GenieACS 暂时不可用，当前显示的是 {stale['stale_since']} 获取的缓存数据", 'warning')
     return render_template('dashboard.html', 
                          devices=devices,
+                         pagination=pagination,
                          now=datetime.utcnow(),
-                         timedelta=timedelta) 
\ No newline at end of file
+                         timedelta=timedelta)
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus 指标，未开启 METRICS_ENABLED 时返回 404"""
+    registry = current_app.config['METRICS']
+    if registry is None:
+        abort(404)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,319 @@
+"""批量设备操作引擎
+
+任务按设备拆分为 BulkJobItem 存入 SQLite，每个进程一个调度线程按任务逐个执行：
+以有界线程池并发调用 GenieACS，并用令牌桶限制每秒下发的任务数，避免压垮 NBI。
+执行结果由调度线程按批写回数据库，SQLite 始终只有一个写入者。
+
+认领任务使用带条件的 `UPDATE`，多个 worker 进程不会重复执行同一任务。执行中的任务随进度写回刷新心跳；
+进程重启、被回收或崩溃后，调度线程启动时及之后每 BULK_RECOVER_INTERVAL 秒认领无人执行的 pending 任务
+和心跳超时的 running 任务，从仍为 pending 的条目继续执行。进程退出时已下发但尚未写回结果的设备会被再次下发。
+创建任务时设备条目分批提交；创建中途退出、心跳超时的 creating 任务设备列表不完整，会被标记为失败并删除条目。
+"""
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from app import db
+from app.models.bulk_job import BulkJob, BulkJobItem
+from app.utils.genieacs import GenieACS
+
+ACTIONS = {
+    'reboot': lambda genieacs, device_id, arguments: genieacs.reboot_device(device_id),
+    'factory_reset': lambda genieacs, device_id, arguments: genieacs.factory_reset(device_id),
+    'set_parameter': lambda genieacs, device_id, arguments: genieacs.set_parameter(
+        device_id, arguments['parameter'], arguments['value']),
+}
+
+# 创建任务时每次写入的设备条目数
+INSERT_CHUNK_SIZE = 1000
+# 调度时每次从数据库读取的待执行条目数
+DISPATCH_CHUNK_SIZE = 500
+
+
+def _iter_device_ids(genieacs, device_ids, query):
+    if device_ids is not None:
+        seen = set()
+        for device_id in device_ids:
+            if device_id and device_id not in seen:
+                seen.add(device_id)
+                yield device_id
+        return
+    for page in genieacs.iter_device_pages(query=query, projection=('_id',), normalize=False):
+        for device in page:
+            yield device['_id']
+
+
+def create_job(action, device_ids=None, query=None, arguments=None, user_id=None, genieacs=None,
+               all_devices=False):
+    """创建批量任务并写入全部设备条目；按查询创建时只以 _id 投影遍历 NBI
+
+    空查询会选中全部设备，只有 all_devices 为 True 时才允许。
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"不支持的操作: {action}")
+    if action == 'set_parameter' and (not arguments or not arguments.get('parameter')):
+        raise ValueError("set_parameter 需要提供 parameter 和 value")
+    if device_ids is None and query is None:
+        raise ValueError("需要提供 device_ids 或 query")
+    if device_ids is None and not query and not all_devices:
+        raise ValueError("查询条件为空会选中全部设备，如确需操作全部设备请指定 all")
+
+    job = BulkJob(action=action,
+                  arguments=json.dumps(arguments, ensure_ascii=False) if arguments else None,
+                  device_query=json.dumps(query, ensure_ascii=False) if query is not None else None,
+                  status='creating',
+                  created_by=user_id,
+                  heartbeat_at=datetime.utcnow())
+    db.session.add(job)
+    db.session.commit()
+
+    # 每批条目单独提交，遍历 NBI 期间不持有 SQLite 写锁
+    total = 0
+    chunk = []
+    try:
+        for device_id in _iter_device_ids(genieacs or GenieACS(), device_ids, query):
+            chunk.append({'job_id': job.id, 'device_id': device_id, 'status': 'pending'})
+            if len(chunk) >= INSERT_CHUNK_SIZE:
+                total += _insert_items(job.id, chunk)
+                chunk = []
+        if chunk:
+            total += _insert_items(job.id, chunk)
+    except Exception as e:
+        db.session.rollback()
+        _discard_jobs([job.id], f"创建任务失败: {e}")
+        raise
+
+    # 创建耗时超过 BULK_STALE_TIMEOUT 时任务可能已被清理，不再改回 pending
+    BulkJob.query.filter_by(id=job.id, status='creating').update(
+        {'total': total, 'status': 'pending' if total else 'completed',
+         'finished_at': None if total else datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    db.session.refresh(job)
+    return job
+
+
+def _insert_items(job_id, chunk):
+    refreshed = BulkJob.query.filter_by(id=job_id, status='creating').update(
+        {'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+    if not refreshed:
+        raise RuntimeError(f"批量任务 {job_id} 创建超时已被清理")
+    db.session.bulk_insert_mappings(BulkJobItem, chunk)
+    db.session.commit()
+    return len(chunk)
+
+
+def _discard_jobs(job_ids, error):
+    """将仍为 creating 的任务标记为失败并删除其已写入的条目，这些条目从未执行"""
+    for job_id in job_ids:
+        discarded = BulkJob.query.filter_by(id=job_id, status='creating').update(
+            {'status': 'failed', 'error': error, 'finished_at': datetime.utcnow()}, synchronize_session=False)
+        if discarded:
+            BulkJobItem.query.filter_by(job_id=job_id).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def cancel_job(job):
+    """取消尚未完成的任务，已下发的设备操作不会撤回"""
+    if job.status in ('pending', 'running'):
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    return False
+
+
+class RateLimiter:
+    """令牌桶限速，rate 为每秒允许的次数，0 表示不限速"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+class BulkTaskRunner:
+    """进程级批量任务调度器"""
+
+    def __init__(self, app):
+        self.app = app
+        self.concurrency = app.config['BULK_CONCURRENCY']
+        self.rate_limit = app.config['BULK_RATE_LIMIT']
+        self.commit_every = app.config['BULK_COMMIT_EVERY']
+        self.recover_interval = app.config['BULK_RECOVER_INTERVAL']
+        self.stale_timeout = app.config['BULK_STALE_TIMEOUT']
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='bulk-jobs', daemon=True)
+                self._thread.start()
+
+    def submit(self, job_id):
+        self.start()
+        self._queue.put(job_id)
+
+    def _run(self):
+        self._recover()
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.recover_interval)
+            except queue.Empty:
+                self._recover()
+                continue
+            self._process(job_id)
+
+    def _claimable(self):
+        """无人执行的任务：pending，或心跳超时的 running"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_timeout)
+        return or_(BulkJob.status == 'pending',
+                   and_(BulkJob.status == 'running',
+                        or_(BulkJob.heartbeat_at.is_(None), BulkJob.heartbeat_at < cutoff)))
+
+    def _recover(self):
+        with self.app.app_context():
+            try:
+                self._discard_abandoned()
+                job_ids = [job_id for job_id, in db.session.query(BulkJob.id)
+                           .filter(self._claimable()).order_by(BulkJob.id)]
+            except Exception as e:
+                self.app.logger.error("Failed to scan orphaned bulk jobs: %s", e)
+                return
+            finally:
+                db.session.remove()
+        for job_id in job_ids:
+            self._process(job_id)
+
+    def _discard_abandoned(self):
+        """清理创建过程中进程退出、心跳超时仍为 creating 的任务；设备列表不完整，不再执行"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_timeout)
+        job_ids = [job_id for job_id, in db.session.query(BulkJob.id).filter(
+            BulkJob.status == 'creating',
+            or_(BulkJob.heartbeat_at.is_(None), BulkJob.heartbeat_at < cutoff))]
+        if job_ids:
+            self.app.logger.warning("Discarding bulk jobs abandoned while creating: %s", job_ids)
+            _discard_jobs(job_ids, '创建任务的进程已退出，任务未执行')
+
+    def _process(self, job_id):
+        with self.app.app_context():
+            try:
+                self._execute(job_id)
+            except Exception as e:
+                self.app.logger.error("Bulk job %s failed: %s", job_id, e)
+                db.session.rollback()
+                BulkJob.query.filter_by(id=job_id, status='running').update(
+                    {'status': 'failed', 'error': str(e), 'finished_at': datetime.utcnow()})
+                db.session.commit()
+            finally:
+                db.session.remove()
+
+    def _call(self, action, device_id, arguments):
+        with self.app.app_context():
+            try:
+                result = ACTIONS[action](GenieACS(), device_id, arguments)
+            except Exception as e:
+                return False, str(e)
+        if result is None:
+            return False, 'GenieACS 请求失败'
+        return True, json.dumps(result, ensure_ascii=False)[:500]
+
+    def _flush(self, job_id, results):
+        if not results:
+            return
+        now = datetime.utcnow()
+        db.session.bulk_update_mappings(BulkJobItem, [
+            {'id': item_id, 'status': 'succeeded' if ok else 'failed', 'result': message, 'updated_at': now}
+            for item_id, ok, message in results
+        ])
+        succeeded = sum(1 for _, ok, _ in results if ok)
+        BulkJob.query.filter_by(id=job_id).update({
+            'succeeded': BulkJob.succeeded + succeeded,
+            'failed': BulkJob.failed + (len(results) - succeeded),
+            'heartbeat_at': now,
+        }, synchronize_session=False)
+        db.session.commit()
+        results.clear()
+
+    def _execute(self, job_id):
+        now = datetime.utcnow()
+        resumed = db.session.query(BulkJob.status).filter_by(id=job_id).scalar() == 'running'
+        claimed = BulkJob.query.filter(BulkJob.id == job_id, self._claimable()).update(
+            {'status': 'running', 'started_at': db.func.coalesce(BulkJob.started_at, now), 'heartbeat_at': now},
+            synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return
+        if resumed:
+            self.app.logger.warning("Resuming orphaned bulk job %s", job_id)
+
+        job = BulkJob.query.get(job_id)
+        action = job.action
+        arguments = json.loads(job.arguments) if job.arguments else {}
+        limiter = RateLimiter(self.rate_limit)
+        results = []
+        in_flight = {}
+        last_item_id = 0
+        cancelled = False
+
+        def collect(futures):
+            for future in futures:
+                ok, message = future.result()
+                results.append((in_flight.pop(future), ok, message))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='bulk-worker') as executor:
+            while not cancelled:
+                items = db.session.query(BulkJobItem.id, BulkJobItem.device_id) \
+                    .filter(BulkJobItem.job_id == job_id,
+                            BulkJobItem.status == 'pending',
+                            BulkJobItem.id > last_item_id) \
+                    .order_by(BulkJobItem.id) \
+                    .limit(DISPATCH_CHUNK_SIZE) \
+                    .all()
+                if not items:
+                    break
+
+                for item_id, device_id in items:
+                    limiter.acquire()
+                    # 在途任务数有上限，结果按批写回
+                    while len(in_flight) >= self.concurrency * 2:
+                        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                        collect(done)
+                    in_flight[executor.submit(self._call, action, device_id, arguments)] = item_id
+                    last_item_id = item_id
+                    if len(results) >= self.commit_every:
+                        self._flush(job_id, results)
+
+                self._flush(job_id, results)
+                BulkJob.query.filter_by(id=job_id, status='running').update(
+                    {'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+                cancelled = db.session.query(BulkJob.status).filter_by(id=job_id).scalar() == 'cancelled'
+
+            done, _ = wait(list(in_flight))
+            collect(done)
+            self._flush(job_id, results)
+
+        if not cancelled:
+            BulkJob.query.filter_by(id=job_id, status='running').update(
+                {'status': 'completed', 'finished_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+        self.app.logger.info("Bulk job %s %s", job_id, 'cancelled' if cancelled else 'completed')
+
+
+def create_bulk_runner(app):
+    return BulkTaskRunner(app)
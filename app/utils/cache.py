@@ -0,0 +1,234 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 清除过期条目的最小间隔（秒）
+PRUNE_INTERVAL = 60
+
+
+class MemoryBackend:
+    """进程内缓存存储
+
+    条目数超过 max_entries 时淘汰最久未使用的条目，获取时间早于 max_age 秒的条目被清除；为 0 时不限。
+    """
+
+    def __init__(self, max_entries=0, max_age=0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pruned_at = time.time()
+
+    def _expired(self, fetched_at, now):
+        return self.max_age and now - fetched_at > self.max_age
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[1], time.time()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, fetched_at):
+        with self._lock:
+            self._entries[key] = (value, fetched_at)
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            now = time.time()
+            if self.max_age and now - self._pruned_at >= PRUNE_INTERVAL:
+                self._pruned_at = now
+                for expired in [k for k, (_, fetched) in self._entries.items() if self._expired(fetched, now)]:
+                    del self._entries[expired]
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """基于本地 SQLite 文件的缓存存储，可在同一主机的多个 worker 进程间共享
+
+    获取时间早于 max_age 秒的条目被清除，条目数超过 max_entries 时淘汰获取最早的条目；为 0 时不限。
+    清理在写入时按 PRUNE_INTERVAL 执行，多个进程各自清理，结果相同。
+    """
+
+    def __init__(self, path, max_entries=0, max_age=0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._local = threading.local()
+        self._pruned_at = time.time()
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS inventory_cache ('
+                     'key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_inventory_cache_fetched_at ON inventory_cache (fetched_at)')
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        conn = self._connect()
+        if self.max_age:
+            conn.execute('DELETE FROM inventory_cache WHERE fetched_at < ?', (now - self.max_age,))
+        if self.max_entries:
+            conn.execute('DELETE FROM inventory_cache WHERE key IN (SELECT key FROM inventory_cache '
+                         'ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+        self._pruned_at = now
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, fetched_at FROM inventory_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if self.max_age and time.time() - row[1] > self.max_age:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, fetched_at):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO inventory_cache (key, value, fetched_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value, ensure_ascii=False), fetched_at))
+        now = time.time()
+        if (self.max_age or self.max_entries) and now - self._pruned_at >= PRUNE_INTERVAL:
+            self.prune(now)
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM inventory_cache WHERE key = ?', (key,))
+
+    def delete_prefix(self, prefix):
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        self._connect().execute("DELETE FROM inventory_cache WHERE key LIKE ? ESCAPE '\\'",
+                                (escaped + '%',))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM inventory_cache')
+
+
+class InventoryCache:
+    """设备清单缓存
+
+    - TTL 内直接返回缓存；
+    - 过期但仍在 stale_ttl 窗口内时先返回旧数据，并在后台刷新（stale-while-revalidate）；
+    - 同一个 key 的并发未命中只会触发一次上游请求（single-flight），TTL 为 0 关闭缓存时同样合并。
+
+    loader 返回 None 表示获取失败，失败结果不会被缓存，之前的结果仍可通过 last_known 取得。缓存中的对象会被多个请求共享，调用方不应修改。
+    """
+
+    def __init__(self, ttl, stale_ttl=0, backend=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend or MemoryBackend()
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get_or_load(self, key, loader):
+        if not self.enabled:
+            return self._load(key, loader, store=False)
+
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._refresh_in_background(key, loader)
+                return value
+
+        return self._load(key, loader)
+
+    def last_known(self, key):
+        """返回最后一次成功加载的 (value, fetched_at)，不论是否过期；上游不可用时用于降级"""
+        if not self.enabled:
+            return None
+        return self.backend.get(key)
+
+    def _load(self, key, loader, store=True):
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = {'event': threading.Event(), 'value': None}
+
+        if not leader:
+            flight['event'].wait()
+            return flight['value']
+
+        try:
+            value = loader()
+            if value is not None and store:
+                self.backend.set(key, value, time.time())
+            flight['value'] = value
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight['event'].set()
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._inflight:
+                return
+        thread = threading.Thread(target=self._load, args=(key, loader), daemon=True)
+        thread.start()
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def invalidate_prefix(self, prefix):
+        self.backend.delete_prefix(prefix)
+
+    def invalidate_device(self, device_id):
+        """设备被操作后使其单设备缓存（摘要、详情、参数）及所有列表缓存失效
+
+        同步和异步客户端共用，新增与单台设备相关的缓存 key 时需同步修改这里。
+        """
+        self.invalidate(f"device:{device_id}")
+        self.invalidate(f"detail:{device_id}")
+        self.invalidate_prefix(f"params:{device_id}:")
+        self.invalidate_prefix("devices:")
+
+    def clear(self):
+        self.backend.clear()
+
+
+def create_inventory_cache(config):
+    """根据配置创建进程级设备清单缓存"""
+    # 过期条目至少保留到 stale-while-revalidate 窗口结束
+    max_age = max(config['INVENTORY_CACHE_MAX_AGE'],
+                  config['INVENTORY_CACHE_TTL'] + config['INVENTORY_CACHE_STALE_TTL'])
+    if config['INVENTORY_CACHE_BACKEND'] == 'sqlite':
+        backend = SQLiteBackend(config['INVENTORY_CACHE_PATH'], config['INVENTORY_CACHE_MAX_ENTRIES'], max_age)
+    else:
+        backend = MemoryBackend(config['INVENTORY_CACHE_MAX_ENTRIES'], max_age)
+    return InventoryCache(config['INVENTORY_CACHE_TTL'],
+                          config['INVENTORY_CACHE_STALE_TTL'],
+                          backend)
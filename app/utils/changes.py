@@ -0,0 +1,106 @@
+"""设备增量变化查询
+
+游标为服务器时间（UTC 毫秒时间戳），不依赖进程内状态，多个 worker 之间可以互用。
+自游标以来的变化包括：
+- 在游标之后 Inform 过的设备（在线时间更新、新注册、重启完成）；
+- 在游标和当前时间之间越过 600 秒阈值、由在线变为离线的设备；
+- 已从 GenieACS 删除的设备，由进程内的 RemovalLog 定期比对设备 ID 得到。
+  扫描由后台 watcher 线程（见 events.py）执行，请求只读取已有记录。
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from flask import current_app
+from app.utils.genieacs import DEVICE_LIST_PROJECTION
+from app.utils.normalize import ONLINE_THRESHOLD_SECONDS
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def _nbi_time(ms):
+    return (datetime(1970, 1, 1) + timedelta(milliseconds=ms)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def build_changes_query(since_ms, until_ms, overlap_ms):
+    """构造自 since_ms 以来发生变化的设备查询
+
+    overlap_ms 用于覆盖 GenieACS 会话写库的延迟：_lastInform 是会话开始时间，
+    而设备数据在会话结束后才可见。重复返回的设备对客户端来说是幂等的。
+    """
+    threshold_ms = ONLINE_THRESHOLD_SECONDS * 1000
+    since_ms -= overlap_ms
+    return {'$or': [
+        {'_lastInform': {'$gt': _nbi_time(since_ms)}},
+        {'_lastInform': {'$gt': _nbi_time(since_ms - threshold_ms),
+                         '$lte': _nbi_time(until_ms - threshold_ms)}},
+    ]}
+
+
+class RemovalLog:
+    """记录已从 GenieACS 删除的设备
+
+    后台 watcher 线程每隔 scan_interval 秒用只含 _id 的投影扫描一次设备 ID，与上次结果比对，
+    删除记录保留 retention 秒；游标早于保留窗口，或首次扫描尚未完成时，客户端需要重新全量加载。
+    """
+
+    def __init__(self, scan_interval, retention):
+        self.scan_interval = scan_interval
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._ids = None
+        self._scanned_at = 0
+        self._baseline_ms = None
+        self._removed = deque()
+
+    @property
+    def scan_due(self):
+        return time.time() - self._scanned_at >= self.scan_interval
+
+    def scan(self, genieacs):
+        """扫描一次设备 ID；请求失败时抛出 requests 异常，已有记录保持不变"""
+        with self._lock:
+            started_ms = now_ms()
+            ids = {device['_id'] for device in genieacs.iter_devices(projection=('_id',), normalize=False)}
+            scanned_ms = now_ms()
+            if self._ids is not None:
+                for device_id in self._ids - ids:
+                    self._removed.append((scanned_ms, device_id))
+            self._ids = ids
+            self._scanned_at = time.time()
+
+            horizon = scanned_ms - self.retention * 1000
+            while self._removed and self._removed[0][0] < horizon:
+                self._removed.popleft()
+            if self._baseline_ms is None:
+                self._baseline_ms = started_ms
+
+    @property
+    def last_removed_ms(self):
+        """最近一次检测到删除的时间，没有记录时为 0"""
+        removed = self._removed
+        return removed[-1][0] if removed else 0
+
+    def removed_since(self, since_ms):
+        """返回 since_ms 之后删除的设备 ID；since_ms 早于记录起点或保留窗口时返回 None"""
+        if self._baseline_ms is None or since_ms < max(self._baseline_ms, now_ms() - self.retention * 1000):
+            return None
+        return [device_id for removed_ms, device_id in list(self._removed) if removed_ms > since_ms]
+
+
+def get_device_changes(genieacs, since_ms, projection=DEVICE_LIST_PROJECTION):
+    """返回自 since_ms 以来的变化；游标无效或过旧时 reset 为 True，客户端需重新全量加载"""
+    until_ms = now_ms()
+    removed = None if since_ms is None else current_app.config['DEVICE_REMOVAL_LOG'].removed_since(since_ms)
+    if since_ms is None or since_ms > until_ms or removed is None:
+        return {'reset': True, 'changed': [], 'removed': [], 'cursor': str(until_ms)}
+
+    query = build_changes_query(since_ms, until_ms, current_app.config['DEVICE_CHANGES_OVERLAP'] * 1000)
+    changed = list(genieacs.iter_devices(query=query, projection=projection, sort={'_id': 1}))
+    return {'reset': False, 'changed': changed, 'removed': removed, 'cursor': str(until_ms)}
+
+
+def create_removal_log(config):
+    return RemovalLog(config['DEVICE_REMOVAL_SCAN_INTERVAL'], config['DEVICE_REMOVAL_RETENTION'])
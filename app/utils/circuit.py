@@ -0,0 +1,87 @@
+"""GenieACS NBI 熔断器
+
+NBI 变慢或宕机时，每个请求都会阻塞到超时（GET 还会重试），worker 很快被占满，管理界面也随之不可用。
+熔断器在连续 failure_threshold 次失败（连接错误、超时或 5xx）后打开，打开期间的请求直接抛出
+CircuitOpenError 而不访问 NBI；reset_timeout 秒后进入半开状态，只放行一个探测请求，
+成功则关闭，失败则重新打开。
+
+熔断器是进程级的，多 worker 部署时每个进程各自计数。
+"""
+import threading
+import time
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """熔断打开时拒绝请求；继承 ConnectionError，已有的 NBI 错误处理无需修改"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout, logger=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probing = False
+
+    @property
+    def enabled(self):
+        return self.failure_threshold > 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """是否放行本次请求；半开状态下同一时间只放行一个探测请求"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state != CLOSED and self.logger:
+                self.logger.info("GenieACS circuit closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN and self.logger:
+                    self.logger.warning("GenieACS circuit opened after %d consecutive failures", self._failures)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+def create_circuit_breaker(app):
+    return CircuitBreaker(app.config['GENIEACS_CIRCUIT_FAILURES'],
+                          app.config['GENIEACS_CIRCUIT_RESET'],
+                          app.logger)
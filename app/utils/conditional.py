@@ -0,0 +1,142 @@
+"""清单版本、ETag 与渲染片段缓存
+
+清单版本由两条水位线组成，只需两次 limit=1 的 NBI 查询（DEVICE_SOURCE 为 local 时是一条 SQL）：
+- 最新的 _lastInform：设备 Inform、新注册都会使它前进；
+- 已越过在线阈值的设备中最新的 _lastInform：设备因超时由在线变为离线时前进。
+另外计入 RemovalLog 最近一次检测到删除的时间。版本经过清单缓存，TTL 内不重复查询。
+
+版本变化（包括进程内首次取得版本）时清除清单缓存中的列表和统计，保证按新版本生成的响应不会用到旧数据；
+版本不变时，带 If-None-Match 的请求直接返回 304，无需获取设备或渲染模板。
+渲染片段按 ETag 摘要缓存在进程内的 LRU 中，摘要已包含版本，无需另行失效。
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app, request
+from app.utils.normalize import ONLINE_THRESHOLD_SECONDS
+
+VERSION_KEY = 'inventory:version'
+
+# 版本变化时需要清除的缓存前缀
+VERSIONED_PREFIXES = ('devices:', 'stats:')
+
+
+def _nbi_version(genieacs):
+    from app.utils.changes import now_ms, _nbi_time
+
+    def newest(query=None):
+        devices = list(genieacs.iter_devices(query=query, projection=('_lastInform',),
+                                             sort={'_lastInform': -1}, limit=1, normalize=False))
+        return devices[0].get('_lastInform') if devices else None
+
+    threshold = _nbi_time(now_ms() - ONLINE_THRESHOLD_SECONDS * 1000)
+    return [newest(), newest({'_lastInform': {'$lte': threshold}})]
+
+
+def _local_version():
+    from app import db
+    from app.models.device import Device
+
+    threshold = datetime.utcnow() - timedelta(seconds=ONLINE_THRESHOLD_SECONDS)
+    crossed = db.func.max(db.case([(Device.last_seen <= threshold, Device.last_seen)], else_=None))
+    newest, offline, count = db.session.query(db.func.max(Device.last_seen), crossed,
+                                              db.func.count(Device.id)).one()
+    return [str(newest), str(offline), count]
+
+
+def get_inventory_version(genieacs):
+    """返回当前清单版本字符串；获取失败且没有旧版本时抛出 requests 异常"""
+    cache = genieacs.cache
+    source = current_app.config['DEVICE_SOURCE']
+    removal_log = current_app.config['DEVICE_REMOVAL_LOG']
+
+    def load():
+        watermarks = _local_version() if source == 'local' else _nbi_version(genieacs)
+        version = json.dumps(watermarks + [removal_log.last_removed_ms])
+        previous = cache.last_known(VERSION_KEY)
+        if previous is None or previous[0] != version:
+            for prefix in VERSIONED_PREFIXES:
+                cache.invalidate_prefix(prefix)
+        return version
+
+    return genieacs.get_cached(VERSION_KEY, load)
+
+
+def inventory_tag(genieacs, *parts):
+    """清单版本与 parts 的摘要，用作 ETag 和片段缓存的 key
+
+    无法确定版本，或返回的是熔断期间的旧数据时返回 None，调用方按无条件请求处理。
+    """
+    try:
+        version = get_inventory_version(genieacs)
+    except Exception as e:
+        current_app.logger.warning("Failed to get inventory version: %s", e)
+        return None
+    if version is None or genieacs.stale_since is not None:
+        return None
+    digest = hashlib.sha1(version.encode())
+    for part in parts:
+        digest.update(b'\0' + str(part).encode())
+    return digest.hexdigest()[:20]
+
+
+def request_args_key():
+    """与参数顺序无关的查询参数表示"""
+    return json.dumps(sorted(request.args.items(multi=True)))
+
+
+def not_modified(tag):
+    """客户端缓存仍有效时返回 304 响应，否则返回 None"""
+    if tag is None or not request.if_none_match.contains_weak(tag):
+        return None
+    response = current_app.response_class(status=304)
+    return with_etag(response, tag)
+
+
+def with_etag(response, tag):
+    """设置弱 ETag（压缩编码不同而语义相同），并要求客户端每次复用前重新验证"""
+    if tag is not None:
+        response.set_etag(tag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class FragmentCache:
+    """按 tag 缓存渲染结果的进程内 LRU，缓存的对象会被多个请求共享，调用方不应修改"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, tag):
+        with self._lock:
+            value = self._entries.get((name, tag))
+            if value is not None:
+                self._entries.move_to_end((name, tag))
+            return value
+
+    def set(self, name, tag, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(name, tag)] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def cached_fragment(genieacs, name, tag, build):
+    """返回 name 在 tag 下的渲染结果，未命中时调用 build 生成；熔断期间返回旧数据时不缓存"""
+    fragments = current_app.config['FRAGMENT_CACHE']
+    value = fragments.get(name, tag) if tag is not None else None
+    if value is None:
+        value = build()
+        if tag is not None and genieacs.stale_since is None:
+            fragments.set(name, tag, value)
+    return value
+
+
+def create_fragment_cache(config):
+    return FragmentCache(config['FRAGMENT_CACHE_SIZE'])
@@ -0,0 +1,216 @@
+"""将 GenieACS 设备清单增量同步到本地 device 表
+
+增量同步只拉取 `_lastInform` 不早于本地水位线（device.last_seen 的最大值）减去
+DEVICE_CHANGES_OVERLAP 的设备，并按页 upsert；全量同步额外比对设备 ID，删除 GenieACS 中已不存在的设备。
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from app import db
+from app.models.device import Device
+from app.utils.genieacs import GenieACS
+from app.utils.normalize import ONLINE_THRESHOLD_SECONDS, parse_utc
+
+WAN_IP_CONNECTION = 'InternetGatewayDevice.WANDevice.1.WANConnectionDevice.1.WANIPConnection.1'
+
+SYNC_PROJECTION = (
+    '_id',
+    '_deviceId',
+    '_lastInform',
+    '_registered',
+    'InternetGatewayDevice.DeviceInfo.SoftwareVersion',
+    f'{WAN_IP_CONNECTION}.ExternalIPAddress',
+    f'{WAN_IP_CONNECTION}.MACAddress',
+)
+
+
+def _parameter_value(device, path):
+    node = device
+    for part in path.split('.'):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    if isinstance(node, dict):
+        return node.get('_value')
+    return node
+
+
+def _truncate(value, length):
+    if value is None:
+        return None
+    return str(value)[:length]
+
+
+def _to_row(device, now):
+    device_id = device.get('_deviceId') or {}
+    last_seen = parse_utc(device.get('_lastInform'))
+    online = last_seen is not None and (now - last_seen).total_seconds() <= ONLINE_THRESHOLD_SECONDS
+    return {
+        'device_id': device['_id'],
+        'manufacturer': _truncate(device_id.get('_Manufacturer'), 64),
+        'model': _truncate(device_id.get('_ProductClass'), 64),
+        'oui': _truncate(device_id.get('_OUI'), 16),
+        'serial_number': _truncate(device_id.get('_SerialNumber'), 64),
+        'firmware_version': _truncate(
+            _parameter_value(device, 'InternetGatewayDevice.DeviceInfo.SoftwareVersion'), 64),
+        'last_seen': last_seen,
+        'registered': parse_utc(device.get('_registered')),
+        'status': 'online' if online else 'offline',
+        'ip_address': _truncate(_parameter_value(device, f'{WAN_IP_CONNECTION}.ExternalIPAddress'), 45),
+        'mac_address': _truncate(_parameter_value(device, f'{WAN_IP_CONNECTION}.MACAddress'), 17),
+    }
+
+
+def ensure_device_table():
+    """创建 device 表及其索引（已存在的旧表也会补建缺少的列和索引）"""
+    db.create_all()
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns(Device.__tablename__)}
+    for column in Device.__table__.columns:
+        if column.name not in existing:
+            db.session.execute(f'ALTER TABLE {Device.__tablename__} ADD COLUMN {column.name} '
+                               f'{column.type.compile(db.engine.dialect)}')
+    db.session.commit()
+    for index in Device.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+def get_watermark():
+    """本地已同步到的最新 _lastInform（UTC）"""
+    return db.session.query(func.max(Device.last_seen)).scalar()
+
+
+# 每条 INSERT 的行数，避免超出 SQLite 的绑定参数上限
+UPSERT_CHUNK_SIZE = 100
+
+
+def _upsert(rows):
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(Device.__table__).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Device.__table__.c.device_id],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != 'device_id'})
+        db.session.execute(stmt)
+    db.session.commit()
+
+
+def _refresh_status(now):
+    """长时间未 Inform 的设备不会出现在增量结果中，需要单独把它们标记为离线"""
+    threshold = now - timedelta(seconds=ONLINE_THRESHOLD_SECONDS)
+    updated = Device.query.filter(Device.status == 'online', Device.last_seen <= threshold) \
+        .update({'status': 'offline'}, synchronize_session=False)
+    db.session.commit()
+    return updated
+
+
+def _nbi_time(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _keyset_after(device, sort_fields):
+    """排在 device 之后的设备条件，与 sort_fields 的排序一致"""
+    if sort_fields == ('_id',):
+        return {'_id': {'$gt': device['_id']}}
+    last_inform = device.get('_lastInform')
+    return {'$or': [
+        {'_lastInform': {'$gt': last_inform}},
+        {'_lastInform': last_inform, '_id': {'$gt': device['_id']}},
+    ]}
+
+
+def _iter_sync_pages(genieacs, query, sort_fields):
+    """按键集分页遍历设备
+
+    每页从上一页最后一台设备之后继续，而不是按 skip 偏移：同步期间 Inform 的设备会移到
+    排序末尾，按偏移分页时其后的设备整体前移一位，位于页边界的设备会被漏掉。
+    """
+    page_size = current_app.config['GENIEACS_PAGE_SIZE']
+    sort = {field: 1 for field in sort_fields}
+    page_query = query
+    while True:
+        page = genieacs.fetch_device_page(page_query, SYNC_PROJECTION, sort, limit=page_size, normalize=False)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after = _keyset_after(page[-1], sort_fields)
+        page_query = {'$and': [query, after]} if query else after
+
+
+def sync_devices(genieacs=None, full=False):
+    """执行一次同步，返回同步统计"""
+    genieacs = genieacs or GenieACS()
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    query = None
+    watermark = None if full else get_watermark()
+    if watermark is not None:
+        # _lastInform 是会话开始时间，会话结束后才写入；回退一段重叠时间，
+        # 以免漏掉会话开始早于水位线、但在上次同步之后才写入的设备
+        overlap = timedelta(seconds=current_app.config['DEVICE_CHANGES_OVERLAP'])
+        query = {'_lastInform': {'$gte': _nbi_time(watermark - overlap)}}
+
+    # 全量同步按 _id 排序保证分页稳定，避免漏掉设备而被误删
+    sort_fields = ('_lastInform', '_id') if watermark is not None else ('_id',)
+    upserted = 0
+    seen_ids = set()
+    for page in _iter_sync_pages(genieacs, query, sort_fields):
+        rows = [_to_row(device, now) for device in page if device.get('_id')]
+        if rows:
+            _upsert(rows)
+            upserted += len(rows)
+        if full:
+            seen_ids.update(row['device_id'] for row in rows)
+
+    deleted = 0
+    if full:
+        stale_ids = [device_id for (device_id,) in db.session.query(Device.device_id)
+                     if device_id not in seen_ids]
+        for start in range(0, len(stale_ids), 500):
+            deleted += Device.query.filter(Device.device_id.in_(stale_ids[start:start + 500])) \
+                .delete(synchronize_session=False)
+        db.session.commit()
+
+    marked_offline = _refresh_status(now)
+    stats = {
+        'full': full,
+        'watermark': watermark.isoformat() if watermark else None,
+        'upserted': upserted,
+        'deleted': deleted,
+        'marked_offline': marked_offline,
+        'elapsed': round(time.perf_counter() - started, 3),
+    }
+    current_app.logger.info("Device sync finished: %s", stats)
+    return stats
+
+
+def start_sync_thread(app):
+    """启动后台同步线程，每个进程只应启动一次
+
+    多个 worker 进程各自启动时会重复同步，生产环境可只在一个进程开启，或改用 cron 调用 flask sync-devices。
+    """
+    interval = app.config['DEVICE_SYNC_INTERVAL']
+    full_every = app.config['DEVICE_SYNC_FULL_EVERY']
+
+    def run():
+        with app.app_context():
+            ensure_device_table()
+        cycle = 0
+        while True:
+            with app.app_context():
+                try:
+                    full = full_every > 0 and cycle % full_every == 0 and cycle > 0
+                    sync_devices(full=full)
+                except Exception as e:
+                    app.logger.error("Device sync failed: %s", e)
+                finally:
+                    db.session.remove()
+            cycle += 1
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='device-sync', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,181 @@
+"""设备状态变化推送
+
+每个进程只有一个后台 watcher 线程：它按 DEVICE_EVENTS_INTERVAL 用增量查询（见 changes.py）
+比对设备清单，把状态变化扇出给所有 SSE 订阅者。上游开销与在线的浏览器数量无关。
+开启 DEVICE_HISTORY_ENABLED 时，watcher 同时把每次观测写入状态历史（见 history.py），没有订阅者时也保持运行。
+watcher 线程在首个请求时启动，并按 DEVICE_REMOVAL_SCAN_INTERVAL 执行 RemovalLog 的删除扫描，请求中不再扫描全网。
+
+每个 SSE 连接会占用一个 worker 线程，部署时应使用 gthread/gevent 等可并发的 worker；
+在 gunicorn 默认的 sync worker 下页面不建立 SSE 连接，改为每 DEVICE_EVENTS_POLL_INTERVAL 秒轮询。
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from app.utils.changes import build_changes_query, now_ms
+from app.utils.normalize import ONLINE_THRESHOLD_SECONDS, STATUS_ONLINE, STATUS_OFFLINE, parse_utc
+
+EVENT_PROJECTION = ('_id', '_deviceId', '_lastInform', '_registered', '_lastBoot')
+
+EVENT_ONLINE = 'online'
+EVENT_OFFLINE = 'offline'
+EVENT_REGISTERED = 'registered'
+EVENT_REBOOTED = 'rebooted'
+EVENT_REMOVED = 'removed'
+# 订阅者消费过慢导致队列溢出时发送，客户端应重新全量加载
+EVENT_RESET = 'reset'
+
+
+class DeviceEventHub:
+    """进程内设备事件中心：单个 watcher 线程 + 多个订阅队列"""
+
+    def __init__(self, app, interval, queue_size):
+        self.app = app
+        self.interval = interval
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._snapshot = None
+        self._cursor = None
+        self.history = app.config['DEVICE_HISTORY']
+
+    def start(self):
+        """启动 watcher 线程，已启动时不做任何操作"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='device-events', daemon=True)
+                self._thread.start()
+
+    def subscribe(self):
+        """注册一个订阅者并返回其事件队列，首次订阅时启动 watcher 线程"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        self.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # 丢弃积压的事件，让客户端重新全量加载
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait({'type': EVENT_RESET, 'time': event['time']})
+
+    def _run(self):
+        from app.utils.genieacs import GenieACS
+
+        removal_log = self.app.config['DEVICE_REMOVAL_LOG']
+        while True:
+            started = time.time()
+            with self.app.app_context():
+                genieacs = GenieACS()
+                if removal_log.scan_due:
+                    try:
+                        removal_log.scan(genieacs)
+                    except Exception as e:
+                        self.app.logger.error("Device removal scan failed: %s", e)
+                try:
+                    if self._subscribers or self.history is not None:
+                        if self._snapshot is None:
+                            self._load_snapshot(genieacs)
+                        else:
+                            self._poll(genieacs)
+                except Exception as e:
+                    self.app.logger.error("Device event watcher failed: %s", e)
+            time.sleep(max(0, self.interval - (time.time() - started)))
+
+    @staticmethod
+    def _state(device):
+        return device.get('_deviceStatus'), device.get('_lastBoot')
+
+    def _record(self, device_id, status, last_inform, observed_ms):
+        if self.history is not None:
+            online = status == STATUS_ONLINE if status in (STATUS_ONLINE, STATUS_OFFLINE) else None
+            self.history.record(device_id, online, last_inform, observed_ms / 1000)
+
+    def _load_snapshot(self, genieacs):
+        cursor = now_ms()
+        now = datetime.utcnow()
+        snapshot = {}
+        # 不做标准化：快照只需要在线状态，历史还需要原始的 UTC Inform 时间
+        for device in genieacs.iter_devices(projection=EVENT_PROJECTION, normalize=False):
+            last_inform = parse_utc(device.get('_lastInform'))
+            status = None
+            if last_inform:
+                status = STATUS_ONLINE if (now - last_inform).total_seconds() <= ONLINE_THRESHOLD_SECONDS \
+                    else STATUS_OFFLINE
+            snapshot[device['_id']] = (status, device.get('_lastBoot'))
+            self._record(device['_id'], status, last_inform, cursor)
+        self._snapshot = snapshot
+        self._cursor = cursor
+
+    def _poll(self, genieacs):
+        until = now_ms()
+        query = build_changes_query(self._cursor, until, self.app.config['DEVICE_CHANGES_OVERLAP'] * 1000)
+        devices = list(genieacs.iter_devices(query=query, projection=EVENT_PROJECTION, sort={'_id': 1},
+                                             normalize=False))
+        last_informs = [parse_utc(device.get('_lastInform')) for device in devices]
+        for device, last_inform in zip(genieacs._normalize_devices(devices), last_informs):
+            device_id = device['_id']
+            status, last_boot = state = self._state(device)
+            previous = self._snapshot.get(device_id)
+            self._snapshot[device_id] = state
+            self._record(device_id, status, last_inform, until)
+
+            if previous is None:
+                self.publish({'type': EVENT_REGISTERED, 'device': device, 'time': until})
+                continue
+            previous_status, previous_boot = previous
+            if status != previous_status and status in ('在线', '离线'):
+                event_type = EVENT_ONLINE if status == '在线' else EVENT_OFFLINE
+                self.publish({'type': event_type, 'device': device, 'time': until})
+            if last_boot and previous_boot and last_boot != previous_boot:
+                self.publish({'type': EVENT_REBOOTED, 'device': device, 'time': until})
+
+        for device_id in self.app.config['DEVICE_REMOVAL_LOG'].removed_since(self._cursor) or []:
+            if self.history is not None:
+                self.history.remove(device_id)
+            if self._snapshot.pop(device_id, None) is not None:
+                self.publish({'type': EVENT_REMOVED, 'device': {'_id': device_id}, 'time': until})
+        self._cursor = until
+
+
+def sse_supported(environ):
+    """当前 worker 能否长期保持 SSE 连接
+
+    gthread 和 gevent/eventlet 等 worker 会设置 wsgi.multithread；sync worker 每个进程同一时间只处理一个请求，
+    一个 SSE 连接就会占满整个进程。
+    """
+    return bool(environ.get('wsgi.multithread'))
+
+
+def iter_sse(hub, keepalive):
+    """订阅事件中心并产出 SSE 文本，连接断开时自动退订"""
+    subscriber = hub.subscribe()
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = subscriber.get(timeout=keepalive)
+            except queue.Empty:
+                # 注释行用于保持连接，防止代理超时断开
+                yield ': keepalive\n\n'
+                continue
+            yield f"id: {event['time']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+def create_event_hub(app):
+    return DeviceEventHub(app, app.config['DEVICE_EVENTS_INTERVAL'], app.config['DEVICE_EVENTS_QUEUE_SIZE'])
@@ -3,221 +3,400 @@ from flask import current_app
 from datetime import datetime
 import pytz
 import json
+import logging
+import random
+import re
+import time
+from datetime import timedelta
 from urllib.parse import quote
+from app.utils.normalize import (ONLINE_THRESHOLD_SECONDS, BEIJING_TZ, convert_to_local_time, format_local,
+                                 normalize_device, normalize_devices)
+from app.utils.streaming import iter_json_array
+from app.utils.parameters import iter_parameters, to_dict
+from app.utils.circuit import CircuitOpenError
+
+# 详情页首屏的 NBI 投影：设备元数据，以及两种数据模型下体量很小的 DeviceInfo 和虚拟参数，
+# 不拉取整棵参数树；根对象以下的参数由详情页经 prefix 接口按需加载
+DETAIL_PROJECTION = ('_id', '_deviceId', '_lastInform', '_registered', '_lastBoot', '_lastBootstrap', '_tags',
+                     'InternetGatewayDevice.DeviceInfo', 'Device.DeviceInfo', 'VirtualParameters')
+
+# 流式模式下每凑满这么多台设备做一次批量标准化
+STREAM_NORMALIZE_BATCH = 256
+
+# 设备列表页面实际用到的字段，避免拉取整棵参数树
+DEVICE_LIST_PROJECTION = ('_id', '_deviceId', '_lastInform', '_registered')
+
+# 关键字搜索匹配的字段
+SEARCH_FIELDS = ('_id', '_deviceId._SerialNumber', '_deviceId._Manufacturer', '_deviceId._ProductClass')
+
+# 在线/离线筛选的时间阈值按此粒度（秒）取整：同一时间段内的相同筛选生成相同的查询，
+# 才能命中清单缓存并合并并发请求；误差远小于在线阈值，且不超过默认的缓存 TTL
+STATUS_THRESHOLD_STEP = 15
+
+
+def build_device_query(status=None, manufacturer=None, product_class=None, q=None):
+    """根据筛选条件构造 GenieACS 查询，由 NBI 在 MongoDB 中完成过滤
+
+    q 按前缀匹配设备 ID、序列号、制造商和型号；锚定开头的正则可以使用 MongoDB 索引。
+    status 的时间阈值按 STATUS_THRESHOLD_STEP 取整。
+    """
+    query = {}
+    if q:
+        pattern = '^' + re.escape(q)
+        query['$or'] = [{field: {'$regex': pattern}} for field in SEARCH_FIELDS]
+    if manufacturer:
+        query['_deviceId._Manufacturer'] = manufacturer
+    if product_class:
+        query['_deviceId._ProductClass'] = product_class
+    if status in ('online', 'offline'):
+        now = time.time() // STATUS_THRESHOLD_STEP * STATUS_THRESHOLD_STEP
+        threshold = datetime.fromtimestamp(now, pytz.UTC) - timedelta(seconds=ONLINE_THRESHOLD_SECONDS)
+        threshold_str = threshold.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        operator = '$gt' if status == 'online' else '$lte'
+        query['_lastInform'] = {operator: threshold_str}
+    return query
+
+
+class _LazyJSON:
+    """日志参数包装：只有日志记录真正被输出时才序列化，并截断过长的载荷"""
+
+    __slots__ = ('payload', 'max_chars')
+
+    def __init__(self, payload, max_chars):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self):
+        text = json.dumps(self.payload, ensure_ascii=False, default=str)
+        if self.max_chars and len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}...(truncated {len(text) - self.max_chars} chars)"
+        return text
+
 
 class GenieACS:
     def __init__(self):
         self.base_url = current_app.config['GENIEACS_URL']
         self.auth = (current_app.config['GENIEACS_USERNAME'], 
                     current_app.config['GENIEACS_PASSWORD'])
-        self.beijing_tz = pytz.timezone('Asia/Shanghai')
+        # create_app 中创建的进程级连接池会话，认证信息已设置在会话上
+        self.session = current_app.config['GENIEACS_SESSION']
+        self.timeout = (current_app.config['GENIEACS_CONNECT_TIMEOUT'],
+                        current_app.config['GENIEACS_READ_TIMEOUT'])
+        self.cache = current_app.config['INVENTORY_CACHE']
+        self.log_payloads = current_app.config['GENIEACS_LOG_PAYLOADS']
+        self.log_sample_rate = current_app.config['GENIEACS_LOG_SAMPLE_RATE']
+        self.log_payload_max_chars = current_app.config['GENIEACS_LOG_PAYLOAD_MAX_CHARS']
+        self.beijing_tz = BEIJING_TZ
+        self.metrics = current_app.config['METRICS']
+        self.circuit = current_app.config['GENIEACS_CIRCUIT']
+        # 本实例返回过降级的缓存数据时，为其中最早一份的获取时间（epoch 秒）
+        self.stale_since = None
+
+    def _request(self, method, endpoint, url, **kwargs):
+        """发起 NBI 请求，经过熔断器并记录指标；endpoint 为指标标签
+
+        熔断打开时直接抛出 CircuitOpenError。连接错误、超时和 5xx 计为失败。
+        流式请求的字节数由调用方在读完后记录。
+        """
+        if not self.circuit.allow():
+            if self.metrics is not None:
+                self.metrics.nbi_rejected.inc((endpoint,))
+            raise CircuitOpenError(f"GenieACS circuit is open, {method} {endpoint} rejected")
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except BaseException:
+            self.circuit.record_failure()
+            if self.metrics is not None:
+                self.metrics.nbi_errors.inc((endpoint, method))
+            raise
+        if response.status_code >= 500:
+            self.circuit.record_failure()
+        else:
+            self.circuit.record_success()
+        if self.metrics is not None:
+            size = None if kwargs.get('stream') else len(response.content)
+            self.metrics.observe_nbi(endpoint, method, str(response.status_code),
+                                     time.perf_counter() - started, size)
+        return response
+
+    def get_cached(self, key, loader, none_is_failure=True):
+        """经清单缓存加载；上游失败或熔断时退回该 key 最后一次成功的结果，并记录到 stale_since
+
+        loader 抛出 requests 异常视为失败，none_is_failure 为 True 时返回 None 也视为失败，
+        否则 None 表示不存在，直接返回；没有可用的旧数据时返回 None 或原样抛出。
+        """
+        try:
+            value = self.cache.get_or_load(key, self._in_app_context(loader))
+            error = None
+        except requests.exceptions.RequestException as e:
+            value, error = None, e
+        if value is not None or (error is None and not none_is_failure):
+            return value
+        entry = self.cache.last_known(key)
+        if entry is None:
+            if error is not None:
+                raise error
+            return None
+        value, fetched_at = entry
+        current_app.logger.warning("GenieACS unavailable, serving %s cached %.0fs ago", key, time.time() - fetched_at)
+        self.stale_since = fetched_at if self.stale_since is None else min(self.stale_since, fetched_at)
+        return value
+
+    def stale_fields(self):
+        """合并到 API 响应中的降级标记，stale_since 为北京时间"""
+        if self.stale_since is None:
+            return {'stale': False}
+        return {'stale': True,
+                'stale_since': format_local(datetime.utcfromtimestamp(self.stale_since), self.beijing_tz)}
+
+    def _in_app_context(self, func):
+        """包装缓存的加载函数，使其在后台刷新线程中也能访问 current_app"""
+        app = current_app._get_current_object()
+
+        def wrapper():
+            with app.app_context():
+                return func()
+        return wrapper
+
+    def _log_payload(self, label, payload):
+        """按需记录 NBI 载荷：仅在开启 GENIEACS_LOG_PAYLOADS 且日志级别为 DEBUG 时按采样率输出"""
+        if not self.log_payloads or not current_app.logger.isEnabledFor(logging.DEBUG):
+            return
+        if self.log_sample_rate < 1 and random.random() >= self.log_sample_rate:
+            return
+        current_app.logger.debug("%s: %s", label, _LazyJSON(payload, self.log_payload_max_chars))
+
+    def _invalidate_device(self, device_id):
+        """设备被操作后使其详情及所有列表缓存失效"""
+        self.cache.invalidate_device(device_id)
 
     def _convert_to_beijing_time(self, utc_time_str):
         """将UTC时间转换为北京时间"""
-        try:
-            if not utc_time_str:
-                current_app.logger.warning("Empty UTC time string received")
-                return None
-                
-            # 记录原始时间字符串
-            current_app.logger.info(f"Converting time - Original UTC time: {utc_time_str}")
-            
-            # 尝试解析不同的时间格式
-            try:
-                utc_time = datetime.fromisoformat(utc_time_str.replace('Z', '+00:00'))
-                current_app.logger.info("Successfully parsed time using fromisoformat")
-            except ValueError as e:
-                current_app.logger.warning(f"Failed to parse with fromisoformat: {e}")
-                try:
-                    utc_time = datetime.strptime(utc_time_str, '%Y-%m-%dT%H:%M:%S.%fZ')
-                    current_app.logger.info("Successfully parsed time using strptime with microseconds")
-                except ValueError as e:
-                    current_app.logger.warning(f"Failed to parse with microseconds format: {e}")
-                    utc_time = datetime.strptime(utc_time_str, '%Y-%m-%dT%H:%M:%SZ')
-                    current_app.logger.info("Successfully parsed time using strptime without microseconds")
-            
-            # 转换为北京时间
-            beijing_time = utc_time.astimezone(self.beijing_tz)
-            formatted_time = beijing_time.strftime('%Y-%m-%d %H:%M:%S')
-            
-            # 记录转换后的时间
-            current_app.logger.info(f"Time conversion successful - Beijing time: {formatted_time}")
-            
-            return formatted_time
-        except Exception as e:
-            current_app.logger.error(f"Time conversion error: {str(e)}, Original time: {utc_time_str}")
-            return utc_time_str
+        return convert_to_local_time(utc_time_str, self.beijing_tz)
 
     def _normalize_device(self, device):
         """标准化设备数据"""
-        if not device:
-            current_app.logger.warning("Empty device data received")
-            return None
-            
-        # 记录原始设备数据
-        current_app.logger.info(f"Normalizing device - Original data: {json.dumps(device, ensure_ascii=False)}")
-        
-        # 处理最后在线时间
-        last_inform_time = device.get('_lastInform', '')
-        current_app.logger.info(f"Processing last inform time: {last_inform_time}")
-        
-        if last_inform_time:
-            device['_lastInform'] = self._convert_to_beijing_time(last_inform_time)
-            
-            try:
-                utc_time = datetime.fromisoformat(last_inform_time.replace('Z', '+00:00'))
-                current_time = datetime.now(pytz.UTC)
-                time_diff = current_time - utc_time
-                
-                # 记录时间差
-                seconds_diff = time_diff.total_seconds()
-                current_app.logger.info(f"Time difference from now: {seconds_diff} seconds")
-                
-                device['_deviceStatus'] = '在线' if seconds_diff <= 600 else '离线'
-                current_app.logger.info(f"Device status set to: {device['_deviceStatus']}")
-            except Exception as e:
-                current_app.logger.error(f"Error determining device status: {str(e)}")
-                device['_deviceStatus'] = '未知'
-
-        # 处理注册时间
-        registered_time = device.get('_registered', '')
-        if registered_time:
-            device['_registered'] = self._convert_to_beijing_time(registered_time)
-            current_app.logger.info(f"Processed registration time: {device['_registered']}")
-
-        # 记录处理后的设备数据
-        current_app.logger.info(f"Device normalization complete - Final data: {json.dumps(device, ensure_ascii=False)}")
+        if self.metrics is None:
+            return normalize_device(device, tz=self.beijing_tz)
+        started = time.perf_counter()
+        device = normalize_device(device, tz=self.beijing_tz)
+        self.metrics.observe_normalize(time.perf_counter() - started, 1)
         return device
 
-    def get_devices(self):
-        """获取所有设备列表"""
+    def _normalize_devices(self, devices):
+        """批量标准化设备数据，整批只取一次当前时间"""
+        if self.metrics is None:
+            return normalize_devices(devices, tz=self.beijing_tz)
+        started = time.perf_counter()
+        devices = normalize_devices(devices, tz=self.beijing_tz)
+        self.metrics.observe_normalize(time.perf_counter() - started, len(devices))
+        return devices
+
+    def _build_list_params(self, query=None, projection=None, skip=None, limit=None, sort=None):
+        """构造 NBI 列表查询参数"""
+        params = {}
+        if query:
+            params['query'] = json.dumps(query)
+        if projection:
+            # NBI 的 projection 为逗号分隔的字段列表
+            params['projection'] = ','.join(projection)
+        if sort:
+            params['sort'] = json.dumps(sort)
+        if skip:
+            params['skip'] = int(skip)
+        if limit:
+            params['limit'] = int(limit)
+        return params
+
+    def get_devices(self, query=None, projection=None, skip=None, limit=None, sort=None):
+        """获取设备列表
+
+        query/projection/skip/limit/sort 会原样传给 NBI，由 GenieACS 完成过滤和分页。
+        结果经过进程级清单缓存，返回的列表为共享对象，调用方不应修改。
+        NBI 不可用时返回最后一次成功的结果，并设置 stale_since。
+        """
+        params = self._build_list_params(query, projection, skip, limit, sort)
+        key = "devices:" + json.dumps(params, sort_keys=True)
+        devices = self.get_cached(key, lambda: self._fetch_devices(params))
+        return devices or []
+
+    def _fetch_devices(self, params):
+        """从 NBI 拉取设备列表，失败时返回 None 以免被缓存"""
+        url = f"{self.base_url}/devices"
         try:
-            url = f"{self.base_url}/devices"
-            current_app.logger.info(f"Fetching devices from: {url}")
-            
-            response = requests.get(url, auth=self.auth)
-            current_app.logger.info(f"API Response Status: {response.status_code}")
-            current_app.logger.info(f"API Response Headers: {dict(response.headers)}")
-            
-            # 记录原始响应
-            try:
-                response_data = response.json()
-                current_app.logger.info(f"API Raw Response: {json.dumps(response_data, ensure_ascii=False)}")
-            except Exception as e:
-                current_app.logger.error(f"Failed to parse response as JSON: {str(e)}")
-                current_app.logger.info(f"Raw response text: {response.text}")
-            
+            response = self._request('GET', 'devices', url, params=params)
+            current_app.logger.debug("NBI GET %s params=%s status=%s", url, params, response.status_code)
+
             if response.status_code != 200:
-                current_app.logger.error(f"Failed to fetch devices: Status {response.status_code}")
-                current_app.logger.error(f"Response content: {response.text}")
-                return []
-                
+                current_app.logger.error("Failed to fetch devices: status=%s body=%.500s",
+                                         response.status_code, response.text)
+                return None
+
             devices = response.json()
+            self._log_payload("NBI /devices response", devices)
             if not devices:
                 current_app.logger.warning("Empty device list returned from API")
                 return []
-                
-            current_app.logger.info(f"Successfully fetched {len(devices)} devices")
-            normalized_devices = [self._normalize_device(device) for device in devices]
-            current_app.logger.info(f"Normalized devices: {json.dumps(normalized_devices, ensure_ascii=False)}")
+
+            normalized_devices = self._normalize_devices(devices)
+            current_app.logger.info("Fetched %d devices from NBI", len(normalized_devices))
             return normalized_devices
         except requests.exceptions.ConnectionError as e:
-            current_app.logger.error(f"Connection error: {str(e)}")
-            return []
+            current_app.logger.error("Connection error: %s", e)
+            return None
         except requests.exceptions.RequestException as e:
-            current_app.logger.error(f"Request error: {str(e)}")
-            return []
+            current_app.logger.error("Request error: %s", e)
+            return None
         except Exception as e:
-            current_app.logger.error(f"Unexpected error: {str(e)}")
-            return []
+            current_app.logger.error("Unexpected error: %s", e)
+            return None
+
+    def fetch_device_page(self, query=None, projection=None, sort=None, skip=None, limit=None, normalize=True):
+        """获取一页设备（不经过缓存），请求失败时抛出 requests 异常"""
+        url = f"{self.base_url}/devices"
+        params = self._build_list_params(query, projection, skip, limit, sort)
+        response = self._request('GET', 'devices', url, params=params)
+        current_app.logger.debug("NBI GET %s params=%s status=%s", url, params, response.status_code)
+        response.raise_for_status()
+
+        devices = response.json()
+        if normalize:
+            devices = self._normalize_devices(devices)
+        return devices
+
+    def iter_device_pages(self, query=None, projection=None, sort=None, page_size=None, normalize=True):
+        """按页遍历 NBI 中的设备（不经过缓存），每次 yield 一页设备列表
+
+        用于同步、导出等需要遍历整个清单的后台任务；任意一页获取失败都会抛出 requests 异常。
+        """
+        page_size = page_size or current_app.config['GENIEACS_PAGE_SIZE']
+        skip = 0
+        while True:
+            devices = self.fetch_device_page(query, projection, sort or {'_id': 1}, skip, page_size,
+                                             normalize=False)
+            fetched = len(devices)
+            if normalize:
+                devices = self._normalize_devices(devices)
+            if devices:
+                yield devices
+            if fetched < page_size:
+                return
+            skip += page_size
+
+    def iter_devices(self, query=None, projection=None, skip=None, limit=None, sort=None, normalize=True):
+        """以流式方式逐台产出设备（不经过缓存）
+
+        使用 stream=True 发起请求并增量解析响应体，内存占用与设备总数无关。
+        请求失败时抛出 requests 异常。
+        """
+        url = f"{self.base_url}/devices"
+        params = self._build_list_params(query, projection, skip, limit, sort)
+        with self._request('GET', 'devices', url, params=params, stream=True) as response:
+            current_app.logger.debug("NBI GET %s params=%s status=%s (stream)", url, params, response.status_code)
+            response.raise_for_status()
+
+            batch = []
+            for device in iter_json_array(response):
+                if not normalize:
+                    yield device
+                    continue
+                batch.append(device)
+                if len(batch) >= STREAM_NORMALIZE_BATCH:
+                    yield from self._normalize_devices(batch)
+                    batch = []
+            if batch:
+                yield from self._normalize_devices(batch)
+            if self.metrics is not None:
+                # 流式响应在读完后才知道字节数（压缩传输时为压缩后的大小）
+                self.metrics.nbi_response_bytes.inc(('devices',), response.raw.tell())
+
+    def get_raw_device(self, device_id):
+        """获取 NBI 返回的原始设备文档（不经过缓存和标准化），不存在时返回 None，请求失败时抛出异常"""
+        url = f"{self.base_url}/devices"
+        params = {"query": json.dumps({"_id": device_id})}
+        response = self._request('GET', 'devices', url, params=params)
+        current_app.logger.debug("NBI GET %s params=%s status=%s", url, params, response.status_code)
+        response.raise_for_status()
+        devices = response.json()
+        return devices[0] if devices else None
 
     def get_device(self, device_id):
-        """获取单个设备详情"""
+        """获取单个设备详情，不存在时返回 None
+
+        NBI 不可用时返回最后一次成功的结果，并设置 stale_since；没有旧数据时抛出 requests 异常。
+        """
+        return self.get_cached(f"device:{device_id}", lambda: self._fetch_device(device_id),
+                               none_is_failure=False)
+
+    def _fetch_device(self, device_id, projection=None):
+        """从 NBI 拉取单个设备，不存在时返回 None，请求失败时抛出 requests 异常"""
+        # 使用查询参数获取设备
+        url = f"{self.base_url}/devices"
+        params = self._build_list_params(query={"_id": device_id}, projection=projection)
         try:
-            current_app.logger.info(f"Fetching device details for {device_id}")
-            
-            # 使用查询参数获取设备
-            url = f"{self.base_url}/devices"
-            params = {
-                "query": json.dumps({"_id": device_id})
-            }
-            current_app.logger.info(f"Request URL: {url}, Params: {params}")
-            
-            response = requests.get(url, params=params, auth=self.auth)
-            current_app.logger.info(f"Response status code: {response.status_code}")
-            
-            # 记录响应内容
-            try:
-                response_text = response.text
-                current_app.logger.info(f"Response content: {response_text}")
-            except Exception as e:
-                current_app.logger.error(f"Failed to get response text: {str(e)}")
-            
-            if response.status_code != 200:
-                current_app.logger.error(f"Failed to fetch device: Status {response.status_code}")
-                return None
-                
+            response = self._request('GET', 'devices', url, params=params)
+            current_app.logger.debug("NBI GET %s params=%s status=%s", url, params, response.status_code)
+            response.raise_for_status()
             devices = response.json()
-            
-            if not devices or len(devices) == 0:
-                current_app.logger.error(f"No device found with ID {device_id}")
-                return None
-                
-            device = devices[0]  # 获取第一个匹配的设备
-            current_app.logger.info(f"Successfully fetched device {device_id}")
-            current_app.logger.info(f"Raw device data: {json.dumps(device, ensure_ascii=False)}")
-            
-            normalized_device = self._normalize_device(device)
-            current_app.logger.info(f"Normalized device data: {json.dumps(normalized_device, ensure_ascii=False)}")
-            
-            return normalized_device
         except requests.exceptions.RequestException as e:
-            current_app.logger.error(f"Request error fetching device {device_id}: {str(e)}")
-            return None
-        except Exception as e:
-            current_app.logger.error(f"Error fetching device {device_id}: {str(e)}")
+            current_app.logger.error("Request error fetching device %s: %s", device_id, e)
+            raise
+
+        if not devices:
+            current_app.logger.warning("No device found with ID %s", device_id)
             return None
 
-    def get_device_parameters(self, device_id):
-        """获取设备参数"""
+        device = devices[0]  # 获取第一个匹配的设备
+        self._log_payload(f"NBI device {device_id}", device)
+        return self._normalize_device(device)
+
+    def get_device_detail(self, device_id):
+        """获取详情页首屏的设备数据及根对象，降级行为同 get_device
+
+        只以 DETAIL_PROJECTION 投影查询一次 NBI，参数只返回根对象（收起状态），
+        完整的参数树和原始文档均由页面按需加载。获取和展开耗时计入 Server-Timing 的 nbi、parameters。
+        """
+        started = time.perf_counter()
+        device = self.get_cached(f"detail:{device_id}", lambda: self._fetch_device(device_id, DETAIL_PROJECTION),
+                                 none_is_failure=False)
+        fetched = time.perf_counter()
+        parameters = [to_dict(parameter) for parameter in iter_parameters(device, depth=1)] if device else []
+        if self.metrics is not None:
+            self.metrics.timing('nbi', fetched - started)
+            self.metrics.timing('parameters', time.perf_counter() - fetched)
+        return device, parameters
+
+    def get_device_parameters(self, device_id, prefix='', depth=None):
+        """获取设备参数
+
+        prefix 作为 NBI 投影，只拉取该子树；depth 为相对 prefix 的展开层数（None 表示全部）。
+        设备不存在时返回 None，降级行为同 get_device。
+        """
+        key = f"params:{device_id}:{prefix}:{depth or ''}"
+        return self.get_cached(key, lambda: self._fetch_device_parameters(device_id, prefix, depth),
+                               none_is_failure=False)
+
+    def _fetch_device_parameters(self, device_id, prefix, depth):
+        url = f"{self.base_url}/devices"
+        params = self._build_list_params(query={"_id": device_id},
+                                         projection=('_id', prefix) if prefix else None)
         try:
-            url = f"{self.base_url}/devices"
-            params = {
-                "query": json.dumps({"_id": device_id}),
-                "projection": json.dumps(["_id", "InternetGatewayDevice"])
-            }
-            current_app.logger.info(f"Fetching parameters for device {device_id}")
-            current_app.logger.info(f"Request URL: {url}, Params: {params}")
-            
-            response = requests.get(url, params=params, auth=self.auth)
-            current_app.logger.info(f"Response status code: {response.status_code}")
-            
-            if response.status_code != 200:
-                current_app.logger.error(f"Failed to fetch parameters: Status {response.status_code}")
-                return []
-                
+            response = self._request('GET', 'devices', url, params=params)
+            current_app.logger.debug("NBI GET %s params=%s status=%s", url, params, response.status_code)
+            response.raise_for_status()
             devices = response.json()
-            if not devices or len(devices) == 0:
-                current_app.logger.error(f"No device found with ID {device_id}")
-                return []
-                
-            device = devices[0]
-            parameters = []
-            
-            # 从设备数据中提取参数
-            if 'InternetGatewayDevice' in device:
-                for key, value in device['InternetGatewayDevice'].items():
-                    parameters.append({
-                        'name': f"InternetGatewayDevice.{key}",
-                        'value': str(value),
-                        'writable': True  # 默认可写
-                    })
-            
-            current_app.logger.info(f"Retrieved {len(parameters)} parameters")
-            return parameters
-        except Exception as e:
-            current_app.logger.error(f"Error fetching parameters for device {device_id}: {str(e)}")
-            return []
+        except requests.exceptions.RequestException as e:
+            current_app.logger.error("Error fetching parameters for device %s: %s", device_id, e)
+            raise
+
+        if not devices:
+            current_app.logger.warning("No device found with ID %s", device_id)
+            return None
+
+        parameters = [to_dict(parameter) for parameter in iter_parameters(devices[0], prefix, depth)]
+        current_app.logger.debug("Retrieved %d parameters for %s under %r", len(parameters), device_id, prefix)
+        return parameters
 
     def set_parameter(self, device_id, parameter, value):
         """设置设备参数"""
@@ -227,31 +406,34 @@ class GenieACS:
                 "parameter": parameter,
                 "value": value
             }
-            response = requests.post(url, json=data, auth=self.auth)
+            response = self._request('POST', 'parameters', url, json=data)
             response.raise_for_status()
+            self._invalidate_device(device_id)
             return response.json()
         except Exception as e:
-            current_app.logger.error(f"Error setting parameter for device {device_id}: {str(e)}")
+            current_app.logger.error("Error setting parameter for device %s: %s", device_id, e)
             return None
 
     def reboot_device(self, device_id):
         """重启设备"""
         try:
             url = f"{self.base_url}/devices/{device_id}/reboot"
-            response = requests.post(url, auth=self.auth)
+            response = self._request('POST', 'reboot', url)
             response.raise_for_status()
+            self._invalidate_device(device_id)
             return response.json()
         except Exception as e:
-            current_app.logger.error(f"Error rebooting device {device_id}: {str(e)}")
+            current_app.logger.error("Error rebooting device %s: %s", device_id, e)
             return None
 
     def factory_reset(self, device_id):
         """恢复出厂设置"""
         try:
             url = f"{self.base_url}/devices/{device_id}/factory_reset"
-            response = requests.post(url, auth=self.auth)
+            response = self._request('POST', 'factory_reset', url)
             response.raise_for_status()
+            self._invalidate_device(device_id)
             return response.json()
         except Exception as e:
-            current_app.logger.error(f"Error factory resetting device {device_id}: {str(e)}")
+            current_app.logger.error("Error factory resetting device %s: %s", device_id, e)
             return None 
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""基于 asyncio 的 GenieACS 客户端
+
+接口与 GenieACS 类一致（get_devices / get_device / get_device_parameters / set_parameter /
+reboot_device / factory_reset），但配置全部由构造参数显式传入，不依赖 current_app，
+可在 aiohttp/uvicorn 等异步 worker 或独立脚本中使用，一个事件循环即可承载数百个并发 NBI 请求。
+
+需要安装 aiohttp。ClientSession 在首次请求时于当前事件循环中创建，用完后应调用 close()
+或使用 `async with`。相同参数的并发 GET 请求会合并为一次 NBI 调用；GET 在网络错误和
+502/503/504 时按指数退避重试，POST 类任务不会重复下发。
+"""
+import asyncio
+import json
+import logging
+import aiohttp
+from app.utils.normalize import BEIJING_TZ, normalize_device, normalize_devices
+from app.utils.parameters import iter_parameters, to_dict
+
+RETRY_STATUSES = frozenset([502, 503, 504])
+
+
+class AsyncGenieACS:
+    def __init__(self, base_url, username=None, password=None, pool_size=20,
+                 connect_timeout=3.05, read_timeout=30, retries=3, retry_backoff=0.3,
+                 cache=None, tz=BEIJING_TZ, logger=None):
+        self.base_url = base_url.rstrip('/')
+        self.auth = aiohttp.BasicAuth(username, password or '') if username else None
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        # 可选的 InventoryCache，设备被操作后与同步客户端一样使其缓存失效
+        self.cache = cache
+        self.tz = tz
+        self.logger = logger or logging.getLogger(__name__)
+        self._session = None
+        self._inflight = {}
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """从 Config 或 app.config 之类的映射构造，适合在 create_app 之外复用同一份配置"""
+        return cls(config['GENIEACS_URL'],
+                   username=config['GENIEACS_USERNAME'],
+                   password=config['GENIEACS_PASSWORD'],
+                   pool_size=config['GENIEACS_POOL_SIZE'],
+                   connect_timeout=config['GENIEACS_CONNECT_TIMEOUT'],
+                   read_timeout=config['GENIEACS_READ_TIMEOUT'],
+                   retries=config['GENIEACS_RETRIES'],
+                   retry_backoff=config['GENIEACS_RETRY_BACKOFF'],
+                   **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector, auth=self.auth, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _invalidate_device(self, device_id):
+        if self.cache is not None:
+            self.cache.invalidate_device(device_id)
+
+    def _build_list_params(self, query=None, projection=None, skip=None, limit=None, sort=None):
+        """构造 NBI 列表查询参数，与 GenieACS._build_list_params 一致"""
+        params = {}
+        if query:
+            params['query'] = json.dumps(query)
+        if projection:
+            params['projection'] = ','.join(projection)
+        if sort:
+            params['sort'] = json.dumps(sort)
+        if skip:
+            params['skip'] = str(int(skip))
+        if limit:
+            params['limit'] = str(int(limit))
+        return params
+
+    async def _get_json(self, path, params):
+        """GET 并解析 JSON，失败时抛出 aiohttp 异常；相同请求并发时只发起一次"""
+        key = path + '?' + json.dumps(params, sort_keys=True)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._get_json_with_retry(path, params))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield 防止某个调用方被取消时连带取消其他等待者共享的请求
+        return await asyncio.shield(task)
+
+    async def _get_json_with_retry(self, path, params):
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while True:
+            try:
+                async with self._get_session().get(url, params=params) as response:
+                    self.logger.debug("NBI GET %s params=%s status=%s", url, params, response.status)
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError, asyncio.TimeoutError) as e:
+                status = getattr(e, 'status', None)
+                if attempt >= self.retries or (status is not None and status not in RETRY_STATUSES):
+                    raise
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                attempt += 1
+
+    async def _post(self, path, data=None):
+        url = f"{self.base_url}{path}"
+        async with self._get_session().post(url, json=data) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def get_devices(self, query=None, projection=None, skip=None, limit=None, sort=None):
+        """获取设备列表，失败时返回空列表"""
+        params = self._build_list_params(query, projection, skip, limit, sort)
+        try:
+            devices = await self._get_json('/devices', params)
+        except Exception as e:
+            self.logger.error("Error fetching devices: %s", e)
+            return []
+        return normalize_devices(devices, tz=self.tz) if devices else []
+
+    async def get_device(self, device_id):
+        """获取单个设备详情，不存在或失败时返回 None"""
+        try:
+            devices = await self._get_json('/devices', {'query': json.dumps({'_id': device_id})})
+        except Exception as e:
+            self.logger.error("Error fetching device %s: %s", device_id, e)
+            return None
+        if not devices:
+            self.logger.warning("No device found with ID %s", device_id)
+            return None
+        return normalize_device(devices[0], tz=self.tz)
+
+    async def get_device_parameters(self, device_id, prefix='', depth=None):
+        """获取设备参数，prefix/depth 含义同 GenieACS.get_device_parameters"""
+        params = self._build_list_params(query={'_id': device_id},
+                                         projection=('_id', prefix) if prefix else None)
+        try:
+            devices = await self._get_json('/devices', params)
+        except Exception as e:
+            self.logger.error("Error fetching parameters for device %s: %s", device_id, e)
+            return None
+        if not devices:
+            self.logger.warning("No device found with ID %s", device_id)
+            return None
+        return [to_dict(parameter) for parameter in iter_parameters(devices[0], prefix, depth)]
+
+    async def set_parameter(self, device_id, parameter, value):
+        """设置设备参数"""
+        try:
+            result = await self._post(f"/devices/{device_id}/parameters",
+                                      {'parameter': parameter, 'value': value})
+        except Exception as e:
+            self.logger.error("Error setting parameter for device %s: %s", device_id, e)
+            return None
+        self._invalidate_device(device_id)
+        return result
+
+    async def reboot_device(self, device_id):
+        """重启设备"""
+        try:
+            result = await self._post(f"/devices/{device_id}/reboot")
+        except Exception as e:
+            self.logger.error("Error rebooting device %s: %s", device_id, e)
+            return None
+        self._invalidate_device(device_id)
+        return result
+
+    async def factory_reset(self, device_id):
+        """恢复出厂设置"""
+        try:
+            result = await self._post(f"/devices/{device_id}/factory_reset")
+        except Exception as e:
+            self.logger.error("Error factory resetting device %s: %s", device_id, e)
+            return None
+        self._invalidate_device(device_id)
+        return result
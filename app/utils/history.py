@@ -0,0 +1,300 @@
+"""设备在线/离线历史
+
+由设备事件 watcher（见 events.py）在每次增量轮询时写入，只保存在进程内：
+- 每台设备两个定长环形缓冲区：状态变化（时间戳 << 1 | 在线位，array('q')）和 Inform 时间（array('I')），
+  容量分别为 DEVICE_HISTORY_TRANSITIONS 和 DEVICE_HISTORY_INFORMS，每台设备的内存有上界；
+- 全网一条按写入顺序排列的状态变化日志（列式 array，容量 DEVICE_HISTORY_MAX_EVENTS），
+  全网抖动和可用率查询只需扫描时间窗口内的变化，再加上对当前状态数组的一次计数；安装了 NumPy 时扫描向量化。
+
+时间均为 UTC 秒级时间戳。上线时间取 _lastInform，离线时间取 _lastInform 加在线阈值，因此不受轮询间隔影响。
+历史从 watcher 首次加载清单时开始，更早的时间窗口会被截断到该时刻。
+"""
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from app.utils.normalize import ONLINE_THRESHOLD_SECONDS, _EPOCH
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+# 当前状态数组中的取值
+STATE_REMOVED = -2
+STATE_UNKNOWN = -1
+STATE_OFFLINE = 0
+STATE_ONLINE = 1
+
+
+def to_timestamp(utc_time):
+    return int((utc_time - _EPOCH).total_seconds())
+
+
+def _ring_append(data, head, capacity, value):
+    """向环形缓冲区追加一项，返回新的写入位置；未满时直接追加"""
+    if len(data) < capacity:
+        data.append(value)
+        return head
+    data[head] = value
+    return (head + 1) % capacity
+
+
+def _ring_items(data, head):
+    """按写入顺序返回环形缓冲区的内容"""
+    return data[head:] + data[:head]
+
+
+class _RingView:
+    """环形缓冲区按写入顺序的只读视图，用于二分查找"""
+
+    __slots__ = ('data', 'head')
+
+    def __init__(self, data, head):
+        self.data = data
+        self.head = head
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return self.data[(self.head + index) % len(self.data)]
+
+
+class _DeviceHistory:
+    __slots__ = ('transitions', 'transitions_head', 'informs', 'informs_head')
+
+    def __init__(self):
+        self.transitions = array('q')
+        self.transitions_head = 0
+        self.informs = array('I')
+        self.informs_head = 0
+
+
+class StatusHistory:
+    def __init__(self, transitions_capacity, informs_capacity, max_events):
+        self.transitions_capacity = transitions_capacity
+        self.informs_capacity = informs_capacity
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self.started_at = None
+        self._index = {}
+        self._ids = []
+        self._devices = []
+        self._state = array('b')
+        # 全网状态变化日志：写入时间、变化时间、设备序号、是否上线
+        self._log_recorded = array('I')
+        self._log_time = array('I')
+        self._log_device = array('I')
+        self._log_online = array('b')
+        self._log_head = 0
+
+    def __len__(self):
+        return self._state.count(STATE_ONLINE) + self._state.count(STATE_OFFLINE)
+
+    def _device_index(self, device_id):
+        index = self._index.get(device_id)
+        if index is None:
+            index = self._index[device_id] = len(self._ids)
+            self._ids.append(device_id)
+            self._devices.append(_DeviceHistory())
+            self._state.append(STATE_UNKNOWN)
+        elif self._devices[index] is None:
+            self._devices[index] = _DeviceHistory()
+        return index
+
+    def record(self, device_id, online, last_inform, now):
+        """记录一次观测
+
+        online 为 True/False，没有 Inform 记录时为 None；last_inform 为 naive UTC datetime，now 为时间戳。
+        首次观测只记录当前状态，之后状态改变时写入一条状态变化。
+        """
+        inform = to_timestamp(last_inform) if last_inform else None
+        now = int(now)
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = now
+            index = self._device_index(device_id)
+            device = self._devices[index]
+
+            informs = device.informs
+            latest = informs[device.informs_head - 1] if informs else None
+            if inform is not None and inform != latest:
+                device.informs_head = _ring_append(informs, device.informs_head, self.informs_capacity, inform)
+
+            previous = self._state[index]
+            state = STATE_UNKNOWN if online is None else int(online)
+            self._state[index] = state
+            if previous < 0 or state < 0 or inform is None:
+                return
+            if previous != state:
+                self._add_transition(index, min(inform if online else inform + ONLINE_THRESHOLD_SECONDS, now),
+                                     state, now)
+            elif online and latest is not None and inform - latest > ONLINE_THRESHOLD_SECONDS:
+                # 两次轮询之间离线后又恢复，状态看起来没有变化，由 Inform 间隔补记这段离线
+                self._add_transition(index, latest + ONLINE_THRESHOLD_SECONDS, STATE_OFFLINE, now)
+                self._add_transition(index, inform, STATE_ONLINE, now)
+
+    def _add_transition(self, index, changed_at, state, now):
+        device = self._devices[index]
+        device.transitions_head = _ring_append(device.transitions, device.transitions_head,
+                                               self.transitions_capacity, changed_at << 1 | state)
+        self._append_log(now, changed_at, index, state)
+
+    def _append_log(self, recorded, changed_at, index, state):
+        head = self._log_head
+        for column, value in ((self._log_recorded, recorded), (self._log_time, changed_at),
+                              (self._log_device, index), (self._log_online, state)):
+            new_head = _ring_append(column, head, self.max_events, value)
+        self._log_head = new_head
+
+    def remove(self, device_id):
+        with self._lock:
+            index = self._index.get(device_id)
+            if index is not None:
+                self._state[index] = STATE_REMOVED
+                self._devices[index] = None
+
+    def _window(self, since):
+        """时间窗口内的全网状态变化 (设备序号, 变化时间, 是否上线)
+
+        日志按写入时间有序，变化时间不晚于写入时间，先二分定位写入时间再按变化时间过滤。
+        """
+        recorded = _RingView(self._log_recorded, self._log_head)
+        start = bisect_left(recorded, since)
+        head, size = self._log_head, len(self._log_recorded)
+        times, devices, online = self._log_time, self._log_device, self._log_online
+        for offset in range(start, size):
+            position = (head + offset) % size
+            if times[position] >= since:
+                yield devices[position], times[position], online[position]
+
+    def _clamp(self, since):
+        return max(since, self.started_at or since)
+
+    def _aggregate(self, since):
+        """按设备汇总窗口内的状态变化，只含仍在清单中的设备
+
+        返回 (设备序号, 变化次数, Σ 方向 × (变化时间 - since)) 三列，上线方向为 +1、离线为 -1。
+        安装了 NumPy 时用 bincount 汇总整条日志并返回数组，否则逐条遍历窗口内的日志并返回列表。
+        """
+        if np is None:
+            counts, sums = {}, {}
+            for index, changed_at, online in self._window(since):
+                counts[index] = counts.get(index, 0) + 1
+                sums[index] = sums.get(index, 0) + (changed_at - since if online else since - changed_at)
+            indexes = [index for index in counts if self._state[index] >= 0]
+            return indexes, [counts[index] for index in indexes], [sums[index] for index in indexes]
+
+        # 复制而不是引用底层缓冲区：被 NumPy 引用的 array 无法再追加
+        times = np.array(self._log_time, dtype=np.int64)
+        mask = times >= since
+        devices = np.array(self._log_device, dtype=np.int64)[mask]
+        directions = np.array(self._log_online, dtype=np.int64)[mask] * 2 - 1
+        size = len(self._ids)
+        counts = np.bincount(devices, minlength=size)
+        sums = np.bincount(devices, weights=directions * (times[mask] - since), minlength=size)
+        indexes = np.flatnonzero((counts > 0) & (np.array(self._state, dtype=np.int8) >= 0))
+        return indexes, counts[indexes], sums[indexes]
+
+    def flapping(self, since, min_transitions=4, limit=50):
+        """since 以来状态变化不少于 min_transitions 次的设备，按次数倒序"""
+        with self._lock:
+            since = self._clamp(since)
+            indexes, counts, _ = self._aggregate(since)
+            if np is None:
+                top = [(-count, index) for count, index in heapq.nsmallest(
+                    limit, ((-count, index) for index, count in zip(indexes, counts) if count >= min_transitions))]
+            else:
+                selected = np.flatnonzero(counts >= min_transitions)
+                selected = selected[np.argsort(-counts[selected], kind='stable')[:limit]]
+                top = zip(counts[selected].tolist(), indexes[selected].tolist())
+            return since, [(self._ids[index], count) for count, index in top]
+
+    def availability(self, since, now, limit=50):
+        """since 到 now 之间的全网可用率，以及期间发生过状态变化的设备中可用率最低的 limit 台
+
+        状态交替变化，设备窗口开始时的状态 = 当前状态 - Σ 方向，因此在线时长
+        = 当前状态 × 窗口长度 - Σ 方向 × (变化时间 - since)，无需按时间顺序重放每台设备的变化。
+        窗口内没有状态变化的设备，其状态在整个窗口内不变，直接由当前状态数组计数得到。
+        """
+        with self._lock:
+            since = self._clamp(since)
+            span = max(now - since, 1)
+            indexes, counts, sums = self._aggregate(since)
+            state = self._state
+
+            if np is None:
+                online_now = [state[index] for index in indexes]
+                ratios = [(online * span - weighted) / span for online, weighted in zip(online_now, sums)]
+                worst = heapq.nsmallest(limit, zip(ratios, (-count for count in counts), indexes))
+                worst = [(index, ratio, -count) for ratio, count, index in worst]
+                unstable_online, unstable_now_online = sum(ratios), sum(online_now)
+            else:
+                online_now = np.array(state, dtype=np.int64)[indexes]
+                ratios = (online_now * span - sums) / span
+                order = np.lexsort((-counts, ratios))[:limit]
+                worst = zip(indexes[order].tolist(), ratios[order].tolist(), counts[order].tolist())
+                unstable_online, unstable_now_online = float(ratios.sum()), int(online_now.sum())
+
+            unstable = len(indexes)
+            always_online = state.count(STATE_ONLINE) - unstable_now_online
+            always_offline = state.count(STATE_OFFLINE) - (unstable - unstable_now_online)
+            total = always_online + always_offline + unstable
+            return {
+                'since': since,
+                'devices': total,
+                'availability': (always_online + unstable_online) / total if total else None,
+                'always_online': always_online,
+                'always_offline': always_offline,
+                'unstable': [(self._ids[index], ratio, count) for index, ratio, count in worst],
+            }
+
+    def device_history(self, device_id, since, now):
+        """单台设备 since 以来的状态变化、Inform 时间和可用率；设备未被记录时返回 None
+
+        环形缓冲区已覆盖掉窗口开头的记录时，since 会推迟到最早一条保留的状态变化。
+        """
+        with self._lock:
+            index = self._index.get(device_id)
+            if index is None or self._devices[index] is None:
+                return None
+            device = self._devices[index]
+            state = self._state[index]
+            transitions = [(value >> 1, value & 1) for value in
+                           _ring_items(device.transitions, device.transitions_head)]
+            informs = _ring_items(device.informs, device.informs_head)
+
+        since = self._clamp(since)
+        if len(transitions) >= self.transitions_capacity and transitions[0][0] > since:
+            since = transitions[0][0]
+        transitions = [item for item in transitions if item[0] >= since]
+
+        availability = None
+        if state >= 0:
+            online = transitions[0][1] == 0 if transitions else state == STATE_ONLINE
+            previous, up = since, 0
+            for changed_at, changed_online in transitions:
+                if online:
+                    up += changed_at - previous
+                online, previous = changed_online, changed_at
+            if online:
+                up += now - previous
+            availability = up / max(now - since, 1)
+
+        return {
+            'since': since,
+            'state': state,
+            'transitions': transitions,
+            'informs': [inform for inform in informs if inform >= since],
+            'availability': availability,
+        }
+
+
+def create_status_history(config):
+    """未开启 DEVICE_HISTORY_ENABLED 时返回 None"""
+    if not config['DEVICE_HISTORY_ENABLED']:
+        return None
+    return StatusHistory(config['DEVICE_HISTORY_TRANSITIONS'],
+                         config['DEVICE_HISTORY_INFORMS'],
+                         config['DEVICE_HISTORY_MAX_EVENTS'])
@@ -0,0 +1,26 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_genieacs_session(config):
+    """创建进程内共享的 GenieACS 连接池会话
+
+    urllib3 连接池本身是线程安全的，同一个 Session 可被多个请求和 gunicorn 线程复用。
+    只对幂等的 GET/HEAD 请求做带退避的重试，POST 类任务不会被重复下发。
+    """
+    session = requests.Session()
+    session.auth = (config['GENIEACS_USERNAME'], config['GENIEACS_PASSWORD'])
+
+    retry = Retry(total=config['GENIEACS_RETRIES'],
+                  backoff_factor=config['GENIEACS_RETRY_BACKOFF'],
+                  status_forcelist=(502, 503, 504),
+                  allowed_methods=frozenset(['GET', 'HEAD']),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1,
+                          pool_maxsize=config['GENIEACS_POOL_SIZE'],
+                          max_retries=retry,
+                          pool_block=False)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
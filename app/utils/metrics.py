@@ -0,0 +1,177 @@
+"""进程内性能指标
+
+记录路由延迟、NBI 调用次数/延迟/字节数、标准化耗时和模板渲染耗时，由 /metrics 以 Prometheus
+文本格式输出。多进程部署时每个 worker 各自统计，由 Prometheus 按实例抓取后汇总。
+
+METRICS_ENABLED 关闭时不会创建 Metrics，也不会注册请求钩子，调用方只需判断 None。
+SERVER_TIMING_ENABLED 开启时，同一请求内的各阶段耗时会汇总到响应的 Server-Timing 头中。
+"""
+import threading
+import time
+from bisect import bisect_left
+import jinja2
+from flask import g, has_request_context, request
+
+SERVER_TIMINGS_KEY = 'app.server_timings'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [各桶计数（非累计）..., 超出最大桶的计数, 总和]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for upper, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", upper))} '
+                             f'{cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", "+Inf"))} '
+                         f'{cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Metrics:
+    def __init__(self, server_timing=False):
+        self.server_timing = server_timing
+        self.http_request_seconds = Histogram(
+            'http_request_duration_seconds', '路由处理耗时（不含流式响应体）', ('endpoint', 'method', 'status'))
+        self.nbi_request_seconds = Histogram(
+            'genieacs_nbi_request_duration_seconds', 'NBI 请求耗时（含响应体下载）', ('endpoint', 'method', 'status'))
+        self.nbi_response_bytes = Counter(
+            'genieacs_nbi_response_bytes_total', 'NBI 响应体字节数', ('endpoint',))
+        self.nbi_errors = Counter(
+            'genieacs_nbi_errors_total', 'NBI 请求异常（连接失败、超时等）', ('endpoint', 'method'))
+        self.nbi_rejected = Counter(
+            'genieacs_nbi_rejected_total', '熔断打开期间被直接拒绝的 NBI 请求', ('endpoint',))
+        self.normalize_seconds = Histogram(
+            'genieacs_normalize_duration_seconds', '设备数据标准化耗时')
+        self.normalized_devices = Counter(
+            'genieacs_normalized_devices_total', '标准化的设备数')
+        self.template_render_seconds = Histogram(
+            'template_render_duration_seconds', 'Jinja 模板渲染耗时', ('template',))
+
+    def timing(self, name, seconds):
+        """把耗时计入当前请求的 Server-Timing
+
+        保存在 request.environ 而不是 g 中：缓存加载函数会在请求内另行推入应用上下文，g 并不共享。
+        """
+        if self.server_timing and has_request_context():
+            timings = request.environ.setdefault(SERVER_TIMINGS_KEY, {})
+            timings[name] = timings.get(name, 0.0) + seconds
+
+    def observe_nbi(self, endpoint, method, status, seconds, size=None):
+        self.nbi_request_seconds.observe((endpoint, method, status), seconds)
+        if size:
+            self.nbi_response_bytes.inc((endpoint,), size)
+        self.timing('upstream', seconds)
+
+    def observe_normalize(self, seconds, count):
+        self.normalize_seconds.observe((), seconds)
+        self.normalized_devices.inc((), count)
+        self.timing('normalize', seconds)
+
+    def render(self):
+        lines = []
+        for metric in (self.http_request_seconds, self.nbi_request_seconds, self.nbi_response_bytes,
+                       self.nbi_errors, self.nbi_rejected, self.normalize_seconds, self.normalized_devices,
+                       self.template_render_seconds):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _timed_template_class(metrics):
+    class TimedTemplate(jinja2.Template):
+        def render(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return super().render(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.template_render_seconds.observe((self.name or '<string>',), elapsed)
+                metrics.timing('render', elapsed)
+    return TimedTemplate
+
+
+def init_metrics(app):
+    """在 create_app 中调用：注册请求钩子和模板计时，返回 Metrics；未开启时返回 None"""
+    if not app.config['METRICS_ENABLED']:
+        return None
+
+    metrics = Metrics(server_timing=app.config['SERVER_TIMING_ENABLED'])
+    app.jinja_env.template_class = _timed_template_class(metrics)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_request_seconds.observe((endpoint, request.method, str(response.status_code)), elapsed)
+        if metrics.server_timing:
+            timings = request.environ.get(SERVER_TIMINGS_KEY, {})
+            entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items()]
+            entries.append(f'total;dur={elapsed * 1000:.1f}')
+            response.headers.add('Server-Timing', ', '.join(entries))
+        return response
+
+    return metrics
@@ -0,0 +1,167 @@
+"""GenieACS 设备数据批量标准化
+
+对整批设备只取一次当前时间，每个时间戳只解析一次，并在同一遍中生成北京时间显示字符串和在线状态。
+安装了 NumPy 且设备数量较多时，`_lastInform` 的解析和在线判断使用 datetime64 向量化计算。
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+import pytz
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+# 最后一次 Inform 距今不超过该秒数即视为在线
+ONLINE_THRESHOLD_SECONDS = 600
+
+STATUS_ONLINE = '在线'
+STATUS_OFFLINE = '离线'
+STATUS_UNKNOWN = '未知'
+
+# 设备数量达到该值时才使用 NumPy 向量化路径，小批量时纯 Python 更快
+VECTORIZE_MIN_DEVICES = 256
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_utc(value):
+    """解析 GenieACS 时间戳为 naive UTC datetime，无法解析时返回 None
+
+    GenieACS 固定输出 `YYYY-MM-DDTHH:MM:SS.sssZ`，先走去掉 Z 后的 fromisoformat 快速路径。
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        if value[-1] == 'Z':
+            return datetime.fromisoformat(value[:-1])
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ')
+        except ValueError:
+            try:
+                parsed = datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+            except ValueError:
+                return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(pytz.UTC).replace(tzinfo=None)
+    return parsed
+
+
+@lru_cache(maxsize=4096)
+def _utc_offset(hour_bucket, tz):
+    """按 UTC 小时缓存时区偏移，同一小时内的时间戳共用一次时区计算"""
+    return tz.utcoffset(_EPOCH + timedelta(hours=hour_bucket))
+
+
+def format_local(utc_time, tz=BEIJING_TZ):
+    """将 naive UTC datetime 格式化为目标时区的显示字符串"""
+    hour_bucket = int((utc_time - _EPOCH).total_seconds() // 3600)
+    local_time = utc_time + _utc_offset(hour_bucket, tz)
+    return local_time.isoformat(sep=' ', timespec='seconds')
+
+
+def convert_to_local_time(utc_time_str, tz=BEIJING_TZ):
+    """将 UTC 时间字符串转换为目标时区显示字符串，无法解析时原样返回"""
+    if not utc_time_str:
+        return None
+    utc_time = parse_utc(utc_time_str)
+    if utc_time is None:
+        return utc_time_str
+    return format_local(utc_time, tz)
+
+
+def _online_status(seconds_diff):
+    return STATUS_ONLINE if seconds_diff <= ONLINE_THRESHOLD_SECONDS else STATUS_OFFLINE
+
+
+def _normalize_python(devices, now, tz):
+    for device in devices:
+        last_inform_time = device.get('_lastInform')
+        if last_inform_time:
+            utc_time = parse_utc(last_inform_time)
+            if utc_time is None:
+                device['_deviceStatus'] = STATUS_UNKNOWN
+            else:
+                device['_lastInform'] = format_local(utc_time, tz)
+                device['_deviceStatus'] = _online_status((now - utc_time).total_seconds())
+
+        registered_time = device.get('_registered')
+        if registered_time:
+            device['_registered'] = convert_to_local_time(registered_time, tz)
+
+
+def _datetime64_input(value):
+    """转换为 datetime64 可直接解析的 naive UTC 字符串
+
+    GenieACS 的标准格式只需去掉 Z；其他格式（如带 +08:00 偏移，NumPy 解析时每批都会发出弃用警告）
+    逐条按 parse_utc 换算为 UTC，无法解析时为 NaT。
+    """
+    if not value:
+        return 'NaT'
+    if value[-1] == 'Z':
+        return value[:-1]
+    parsed = parse_utc(value)
+    return parsed.isoformat() if parsed is not None else 'NaT'
+
+
+def _normalize_numpy(devices, now, tz):
+    raw = [device.get('_lastInform') or '' for device in devices]
+    try:
+        parsed = np.array([_datetime64_input(value) for value in raw], dtype='datetime64[ms]')
+    except ValueError:
+        # 存在非标准格式时整体回退到逐条解析
+        return _normalize_python(devices, now, tz)
+
+    valid = ~np.isnat(parsed)
+    online = (np.datetime64(now, 'ms') - parsed) <= np.timedelta64(ONLINE_THRESHOLD_SECONDS, 's')
+
+    hours = parsed[valid].astype('datetime64[h]').astype('int64')
+    unique_hours, inverse = np.unique(hours, return_inverse=True)
+    offsets = np.array([int(_utc_offset(int(h), tz).total_seconds()) for h in unique_hours],
+                       dtype='timedelta64[s]')
+    local = (parsed[valid].astype('datetime64[s]') + offsets[inverse]).astype(str)
+
+    local_iter = iter(local.tolist())
+    for device, last_inform_time, is_valid, is_online in zip(devices, raw, valid.tolist(), online.tolist()):
+        if last_inform_time:
+            if is_valid:
+                device['_lastInform'] = next(local_iter).replace('T', ' ')
+                device['_deviceStatus'] = STATUS_ONLINE if is_online else STATUS_OFFLINE
+            else:
+                device['_deviceStatus'] = STATUS_UNKNOWN
+
+        registered_time = device.get('_registered')
+        if registered_time:
+            device['_registered'] = convert_to_local_time(registered_time, tz)
+
+
+def normalize_devices(devices, now=None, tz=BEIJING_TZ, vectorize=None):
+    """批量标准化设备数据（原地修改并返回列表）
+
+    - `_lastInform`、`_registered` 转换为北京时间显示字符串；
+    - `_deviceStatus` 根据距 now 的秒数判定在线/离线，无法解析时为未知；
+    - vectorize 为 None 时根据 NumPy 是否可用及批量大小自动选择。
+    """
+    devices = [device for device in devices if device]
+    if not devices:
+        return devices
+    now = now or datetime.utcnow()
+    if vectorize is None:
+        vectorize = np is not None and len(devices) >= VECTORIZE_MIN_DEVICES
+    if vectorize and np is not None:
+        _normalize_numpy(devices, now, tz)
+    else:
+        _normalize_python(devices, now, tz)
+    return devices
+
+
+def normalize_device(device, now=None, tz=BEIJING_TZ):
+    """标准化单个设备数据"""
+    if not device:
+        return None
+    _normalize_python([device], now or datetime.utcnow(), tz)
+    return device
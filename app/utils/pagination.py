@@ -0,0 +1,77 @@
+from datetime import datetime
+from flask import current_app, request
+from app.utils.genieacs import DEVICE_LIST_PROJECTION, build_device_query
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def get_device_list_args():
+    """从请求参数中解析分页、筛选和字段投影"""
+    page = _positive_int(request.args.get('page'), 1)
+    limit = _positive_int(request.args.get('limit'), current_app.config['DEVICES_PER_PAGE'])
+    limit = min(limit, current_app.config['DEVICES_MAX_PER_PAGE'])
+
+    filters = {
+        'status': request.args.get('status', '').strip() or None,
+        'manufacturer': request.args.get('manufacturer', '').strip() or None,
+        'product_class': request.args.get('product_class', '').strip() or None,
+        'q': request.args.get('q', '').strip() or None,
+    }
+
+    fields = request.args.get('fields', '').strip()
+    if fields:
+        projection = tuple(f.strip() for f in fields.split(',') if f.strip())
+    else:
+        projection = DEVICE_LIST_PROJECTION
+
+    return {
+        'page': page,
+        'limit': limit,
+        'skip': (page - 1) * limit,
+        'filters': filters,
+        'query': build_device_query(**filters),
+        'projection': projection,
+    }
+
+
+def _fetch_local_devices(args):
+    """从 sync-devices 同步的本地 device 表读取"""
+    from app.models.device import Device
+
+    rows = Device.filtered(**args['filters']) \
+        .order_by(Device.device_id) \
+        .offset(args['skip']) \
+        .limit(args['limit'] + 1) \
+        .all()
+    now = datetime.utcnow()
+    return [row.to_genieacs(now) for row in rows]
+
+
+def fetch_device_page(genieacs, args):
+    """按页获取设备，多取一条用于判断是否还有下一页
+
+    DEVICE_SOURCE 为 local 时读取本地镜像表，否则查询 NBI。
+    """
+    if current_app.config['DEVICE_SOURCE'] == 'local':
+        devices = _fetch_local_devices(args)
+    else:
+        devices = genieacs.get_devices(query=args['query'],
+                                       projection=args['projection'],
+                                       skip=args['skip'],
+                                       limit=args['limit'] + 1,
+                                       sort={'_id': 1})
+    has_next = len(devices) > args['limit']
+    pagination = {
+        'page': args['page'],
+        'limit': args['limit'],
+        'has_prev': args['page'] > 1,
+        'has_next': has_next,
+        'filters': {k: v for k, v in args['filters'].items() if v},
+    }
+    return devices[:args['limit']], pagination
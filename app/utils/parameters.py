@@ -0,0 +1,79 @@
+"""TR-069 参数树展开
+
+GenieACS 的设备文档中，对象节点带 `_object`/`_writable`/`_timestamp`，叶子节点带
+`_value`/`_type`/`_writable`/`_timestamp`，以 `_` 开头的键均为元数据，其余键为子节点。
+这里用显式栈迭代展开，真实设备 5k–20k 个叶子也不会触发递归深度限制。
+"""
+from collections import namedtuple
+from app.utils.normalize import convert_to_local_time
+
+Parameter = namedtuple('Parameter', ['path', 'value', 'type', 'writable', 'timestamp', 'object', 'level'])
+
+
+def _children(node):
+    return [(name, child) for name, child in node.items()
+            if not name.startswith('_') and isinstance(child, dict)]
+
+
+def _is_object(node):
+    if '_object' in node:
+        return bool(node['_object'])
+    return '_value' not in node
+
+
+def _parameter(path, node, level):
+    return Parameter(path=path,
+                     value=node.get('_value'),
+                     type=node.get('_type'),
+                     writable=bool(node.get('_writable', False)),
+                     timestamp=node.get('_timestamp'),
+                     object=_is_object(node),
+                     level=level)
+
+
+def find_node(tree, prefix):
+    """按点分路径定位子树，不存在时返回 None"""
+    node = tree
+    if prefix:
+        for part in prefix.split('.'):
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+    return node if isinstance(node, dict) else None
+
+
+def iter_parameters(tree, prefix='', depth=None):
+    """以深度优先顺序产出 prefix 之下的参数
+
+    depth 为相对 prefix 的展开层数，None 或 0 表示不限；超出层数的对象只产出自身，不再展开。
+    prefix 指向叶子时只产出该叶子。
+    """
+    node = find_node(tree, prefix)
+    if node is None:
+        return
+    if prefix and not _is_object(node):
+        yield _parameter(prefix, node, 0)
+        return
+
+    base = f"{prefix}." if prefix else ''
+    stack = [(base + name, child, 1) for name, child in reversed(_children(node))]
+    while stack:
+        path, node, level = stack.pop()
+        parameter = _parameter(path, node, level)
+        yield parameter
+        if parameter.object and (not depth or level < depth):
+            stack.extend((f"{path}.{name}", child, level + 1)
+                         for name, child in reversed(_children(node)))
+
+
+def to_dict(parameter):
+    """转换为模板和 API 使用的字典，时间戳转换为北京时间"""
+    return {
+        'name': parameter.path,
+        'value': parameter.value,
+        'type': parameter.type,
+        'writable': parameter.writable,
+        'timestamp': convert_to_local_time(parameter.timestamp) if parameter.timestamp else None,
+        'object': parameter.object,
+        'level': parameter.level,
+    }
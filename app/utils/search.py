@@ -0,0 +1,196 @@
+"""设备标识的进程内搜索索引
+
+索引设备 ID、序列号、OUI、型号和制造商，支持不区分大小写的子串匹配（包含前缀匹配）。
+每个字段按 3-gram 建立倒排表，倒排表用 array('I') 存储文档序号，10 万台设备约占十几 MB；
+查询时取最稀有的 gram 的倒排表作为候选，逐个校验子串，凑满 limit 即停止。
+
+设备标识在注册后不会变化，增量刷新只需拉取新注册的设备，并借助 RemovalLog 剔除已删除的设备。
+构建和刷新都在后台线程中执行；首次构建完成前，搜索按前缀查询 NBI（search_nbi），经过清单缓存和降级路径。
+"""
+import threading
+import time
+from array import array
+from flask import current_app
+from app.utils.changes import now_ms, _nbi_time
+from app.utils.genieacs import GenieACS, build_device_query
+
+SEARCH_PROJECTION = ('_id', '_deviceId._SerialNumber', '_deviceId._OUI',
+                     '_deviceId._ProductClass', '_deviceId._Manufacturer')
+
+NGRAM = 3
+
+# 已删除文档超过该比例时重建索引以回收空间
+COMPACT_RATIO = 0.25
+
+
+def _fields(device):
+    device_id = device.get('_deviceId') or {}
+    return (device['_id'],
+            device_id.get('_SerialNumber'),
+            device_id.get('_OUI'),
+            device_id.get('_ProductClass'),
+            device_id.get('_Manufacturer'))
+
+
+class DeviceSearchIndex:
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._reset()
+        self._cursor = None
+        self._refreshed_at = 0
+
+    def _reset(self):
+        self._docs = []
+        self._texts = []
+        self._by_device = {}
+        self._grams = {}
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._by_device)
+
+    def _add(self, fields):
+        doc = len(self._docs)
+        values = [value.lower() for value in fields if value]
+        self._docs.append(fields)
+        # 用换行分隔各字段，查询串不含换行，不会跨字段误匹配
+        self._texts.append('\n'.join(values))
+        self._by_device[fields[0]] = doc
+        grams = set()
+        for value in values:
+            if len(value) < NGRAM:
+                # 短字段整体作为一个 gram，短查询才能匹配到
+                grams.add(value)
+            grams.update(value[i:i + NGRAM] for i in range(len(value) - NGRAM + 1))
+        for gram in grams:
+            postings = self._grams.get(gram)
+            if postings is None:
+                postings = self._grams[gram] = array('I')
+            postings.append(doc)
+
+    def _remove(self, device_id):
+        doc = self._by_device.pop(device_id, None)
+        if doc is not None:
+            self._docs[doc] = None
+            self._texts[doc] = None
+            self._dead += 1
+
+    def _compact(self):
+        live = [fields for fields in self._docs if fields is not None]
+        self._reset()
+        for fields in live:
+            self._add(fields)
+
+    def rebuild(self, devices):
+        """用完整的设备列表重建索引；在锁外构建新索引后整体替换，构建期间查询不受影响"""
+        fresh = DeviceSearchIndex(self.refresh_interval)
+        for device in devices:
+            fresh._add(_fields(device))
+        with self._lock:
+            self._docs, self._texts, self._by_device = fresh._docs, fresh._texts, fresh._by_device
+            self._grams, self._dead = fresh._grams, 0
+
+    def update(self, devices):
+        """新增或更新设备，标识未变的设备不做任何操作"""
+        with self._lock:
+            for device in devices:
+                fields = _fields(device)
+                doc = self._by_device.get(fields[0])
+                if doc is not None and self._docs[doc] == fields:
+                    continue
+                self._remove(fields[0])
+                self._add(fields)
+
+    def remove(self, device_ids):
+        with self._lock:
+            for device_id in device_ids:
+                self._remove(device_id)
+            if self._dead > len(self._docs) * COMPACT_RATIO:
+                self._compact()
+
+    def search(self, q, limit=20):
+        """返回标识中包含 q 的设备字段元组，不区分大小写"""
+        q = q.strip().lower()
+        if not q:
+            return []
+        with self._lock:
+            if len(q) >= NGRAM:
+                candidates = None
+                for i in range(len(q) - NGRAM + 1):
+                    postings = self._grams.get(q[i:i + NGRAM])
+                    if postings is None:
+                        return []
+                    if candidates is None or len(postings) < len(candidates):
+                        candidates = postings
+                candidates = [candidates]
+            else:
+                # 短查询：包含它的 gram 的倒排表即为候选
+                candidates = sorted((postings for gram, postings in self._grams.items() if q in gram), key=len)
+
+            results = []
+            seen = set()
+            texts = self._texts
+            for postings in candidates:
+                for doc in postings:
+                    text = texts[doc]
+                    if text is None or doc in seen or q not in text:
+                        continue
+                    seen.add(doc)
+                    results.append(self._docs[doc])
+                    if len(results) >= limit:
+                        return results
+            return results
+
+    @property
+    def ready(self):
+        """首次构建是否已完成"""
+        return self._cursor is not None
+
+    def refresh_in_background(self, app):
+        """按 refresh_interval 在后台线程中刷新，同一时间只有一个刷新在执行；失败时保留旧索引，下次调用重试"""
+        if time.time() - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        thread = threading.Thread(target=self._refresh_worker, args=(app,), name='device-search-index', daemon=True)
+        thread.start()
+
+    def _refresh_worker(self, app):
+        try:
+            with app.app_context():
+                self._refresh(GenieACS())
+        except Exception as e:
+            app.logger.error("Device search index refresh failed: %s", e)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, genieacs):
+        started_ms = now_ms()
+        removed = None if self._cursor is None else \
+            current_app.config['DEVICE_REMOVAL_LOG'].removed_since(self._cursor)
+        if removed is None:
+            self.rebuild(genieacs.iter_devices(projection=SEARCH_PROJECTION, normalize=False))
+        else:
+            overlap_ms = current_app.config['DEVICE_CHANGES_OVERLAP'] * 1000
+            query = {'_registered': {'$gt': _nbi_time(self._cursor - overlap_ms)}}
+            self.update(list(genieacs.iter_devices(query=query, projection=SEARCH_PROJECTION, normalize=False)))
+            self.remove(removed)
+        self._cursor = started_ms
+        self._refreshed_at = time.time()
+
+def search_nbi(genieacs, q, limit=20):
+    """索引就绪前的搜索：按前缀匹配设备 ID、序列号、制造商和型号，区分大小写
+
+    经过 get_devices 的清单缓存，NBI 不可用时返回缓存的旧结果（见 genieacs.stale_fields()）。
+    """
+    q = q.strip()
+    if not q:
+        return []
+    devices = genieacs.get_devices(query=build_device_query(q=q), projection=SEARCH_PROJECTION, limit=limit)
+    return [_fields(device) for device in devices]
+
+
+def create_search_index(config):
+    return DeviceSearchIndex(config['DEVICE_SEARCH_REFRESH'])
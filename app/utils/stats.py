@@ -0,0 +1,148 @@
+"""设备清单统计
+
+仪表盘只需要计数和分布，不需要完整的设备列表：
+- DEVICE_SOURCE 为 local 时由 SQLite 的 GROUP BY / SUM(CASE) 完成聚合；
+- 否则以最小投影流式遍历 NBI，单次遍历得到全部统计，结果经过清单缓存，TTL 内不重复遍历。
+最近活动的设备直接用按 _lastInform 倒序的 NBI 查询获取。
+"""
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from app.utils.genieacs import DEVICE_LIST_PROJECTION
+from app.utils.normalize import ONLINE_THRESHOLD_SECONDS, parse_utc
+
+STATS_PROJECTION = ('_id', '_deviceId._Manufacturer', '_deviceId._ProductClass', '_lastInform')
+
+# 最后 Inform 距今时长直方图的默认分桶上界（秒），最后一个桶为超过最大上界的设备
+AGE_BUCKETS = (300, 600, 3600, 86400, 7 * 86400)
+
+RECENT_WINDOW_SECONDS = 86400
+
+
+def _empty_stats(buckets):
+    return {
+        'total': 0,
+        'online': 0,
+        'offline': 0,
+        'unknown': 0,
+        'recent': 0,
+        'by_manufacturer': Counter(),
+        'by_model': Counter(),
+        'online_by_manufacturer': Counter(),
+        'age_counts': [0] * (len(buckets) + 1),
+    }
+
+
+def _add_age(stats, buckets, age):
+    if age is None:
+        stats['unknown'] += 1
+        return
+    if age <= ONLINE_THRESHOLD_SECONDS:
+        stats['online'] += 1
+    else:
+        stats['offline'] += 1
+    if age <= RECENT_WINDOW_SECONDS:
+        stats['recent'] += 1
+    for index, upper in enumerate(buckets):
+        if age <= upper:
+            stats['age_counts'][index] += 1
+            return
+    stats['age_counts'][-1] += 1
+
+
+def compute_stats(devices, buckets=AGE_BUCKETS, now=None):
+    """单次遍历原始（未标准化的）NBI 设备文档计算统计"""
+    now = now or datetime.utcnow()
+    stats = _empty_stats(buckets)
+    for device in devices:
+        device_id = device.get('_deviceId') or {}
+        manufacturer = device_id.get('_Manufacturer') or 'Unknown'
+        stats['total'] += 1
+        stats['by_manufacturer'][manufacturer] += 1
+        stats['by_model'][f"{manufacturer} {device_id.get('_ProductClass') or 'Unknown'}"] += 1
+
+        last_inform = parse_utc(device.get('_lastInform'))
+        age = (now - last_inform).total_seconds() if last_inform else None
+        _add_age(stats, buckets, age)
+        if age is not None and age <= ONLINE_THRESHOLD_SECONDS:
+            stats['online_by_manufacturer'][manufacturer] += 1
+    return stats
+
+
+def _local_stats(buckets, now):
+    """用 SQL 聚合本地 device 表"""
+    from app import db
+    from app.models.device import Device
+
+    def seen_within(seconds):
+        return db.func.sum(db.case([(Device.last_seen > now - timedelta(seconds=seconds), 1)], else_=0))
+
+    stats = _empty_stats(buckets)
+    online_column = seen_within(ONLINE_THRESHOLD_SECONDS)
+    for manufacturer, model, total, online in db.session.query(
+            Device.manufacturer, Device.model, db.func.count(Device.id), online_column) \
+            .group_by(Device.manufacturer, Device.model):
+        manufacturer = manufacturer or 'Unknown'
+        stats['by_manufacturer'][manufacturer] += total
+        stats['by_model'][f"{manufacturer} {model or 'Unknown'}"] += total
+        stats['online_by_manufacturer'][manufacturer] += online or 0
+
+    row = db.session.query(db.func.count(Device.id),
+                           db.func.count(Device.last_seen),
+                           online_column,
+                           seen_within(RECENT_WINDOW_SECONDS),
+                           *[seen_within(upper) for upper in buckets]).one()
+    total, seen, online, recent, cumulative = row[0], row[1], row[2] or 0, row[3] or 0, [n or 0 for n in row[4:]]
+    stats.update(total=total, online=online, offline=seen - online, unknown=total - seen, recent=recent)
+    # SQL 得到的是累计计数，转换为各桶计数
+    previous = 0
+    for index, count in enumerate(cumulative):
+        stats['age_counts'][index] = count - previous
+        previous = count
+    stats['age_counts'][-1] = seen - previous
+    return stats
+
+
+def _to_response(stats, buckets, top):
+    def ranked(counts):
+        return [{'name': name, 'count': count} for name, count in Counter(counts).most_common(top)]
+
+    histogram = [{'le': upper, 'count': count} for upper, count in zip(buckets, stats['age_counts'])]
+    histogram.append({'le': None, 'count': stats['age_counts'][-1]})
+    return {
+        'total': stats['total'],
+        'online': stats['online'],
+        'offline': stats['offline'],
+        'unknown': stats['unknown'],
+        'recent': stats['recent'],
+        'by_manufacturer': [dict(item, online=stats['online_by_manufacturer'].get(item['name'], 0))
+                            for item in ranked(stats['by_manufacturer'])],
+        'by_model': ranked(stats['by_model']),
+        'last_inform_age': histogram,
+    }
+
+
+def get_device_stats(genieacs, buckets=AGE_BUCKETS, top=10):
+    """返回设备统计；by_manufacturer/by_model 只保留数量最多的 top 项"""
+    now = datetime.utcnow()
+    if current_app.config['DEVICE_SOURCE'] == 'local':
+        stats = _local_stats(buckets, now)
+    else:
+        def load():
+            return compute_stats(genieacs.iter_devices(projection=STATS_PROJECTION, normalize=False),
+                                 buckets)
+        stats = genieacs.get_cached("stats:" + json.dumps(list(buckets)), load)
+    return _to_response(stats, buckets, top)
+
+
+def get_recent_devices(genieacs, limit):
+    """最近 Inform 的 limit 台设备"""
+    if current_app.config['DEVICE_SOURCE'] == 'local':
+        from app.models.device import Device
+
+        now = datetime.utcnow()
+        rows = Device.query.filter(Device.last_seen.isnot(None)) \
+            .order_by(Device.last_seen.desc()).limit(limit).all()
+        return [row.to_genieacs(now) for row in rows]
+    return genieacs.get_devices(projection=DEVICE_LIST_PROJECTION, limit=limit, sort={'_lastInform': -1})
@@ -0,0 +1,103 @@
+"""NBI 响应的增量 JSON 解析
+
+GenieACS 的 /devices 返回一个顶层 JSON 数组。这里按块读取响应体并逐个解析数组元素，
+内存占用只与单个设备大小有关，而与整个响应大小无关。安装了 ijson 时优先使用 ijson。
+"""
+import codecs
+import json
+
+try:
+    import ijson
+except ImportError:  # ijson 为可选依赖
+    ijson = None
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_END = _WHITESPACE + ',]'
+
+
+class _ResponseReader:
+    """把 requests 响应的分块迭代器包装成 ijson 需要的 file-like 对象"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _iter_array_stdlib(chunks):
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    started = False
+    finished = False
+    exhausted = False
+
+    while not finished:
+        # 跳过空白、数组起始符和元素分隔符
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise ValueError(f"Expected JSON array, got {char!r}")
+                started = True
+                pos += 1
+            elif char == ',':
+                pos += 1
+            elif char == ']':
+                finished = True
+                break
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                    break
+                if isinstance(item, (int, float)) and not exhausted and \
+                        (end == len(buffer) or buffer[end] not in _NUMBER_END):
+                    # 数字可能被分块截断（如 "1." 与 "5"），等读入后续数据再解析
+                    break
+                yield item
+                pos = end
+        if finished:
+            break
+        if exhausted:
+            if not started:
+                return
+            raise ValueError("Unexpected end of JSON array")
+
+        # 丢弃已解析部分，读入下一块
+        buffer = buffer[pos:]
+        pos = 0
+        chunk = next(chunks, None)
+        if chunk is None:
+            buffer += text_decoder.decode(b'', final=True)
+            exhausted = True
+        else:
+            buffer += text_decoder.decode(chunk)
+
+
+def iter_json_array(response, chunk_size=CHUNK_SIZE):
+    """逐个产出流式响应中顶层 JSON 数组的元素，response 需以 stream=True 发起"""
+    chunks = response.iter_content(chunk_size=chunk_size)
+    if ijson is not None:
+        return ijson.items(_ResponseReader(chunks), 'item', use_float=True)
+    return _iter_array_stdlib(chunks)
@@ -0,0 +1,72 @@
+"""设备标准化耗时基准
+
+在给定日志级别下测量 GenieACS._normalize_device（或批量 _normalize_devices）的单设备耗时，
+日志写入 os.devnull，以包含格式化和 I/O 的开销。
+
+用法:
+    python benchmarks/bench_normalize.py --devices 2000 --log-level INFO
+    python benchmarks/bench_normalize.py --log-level DEBUG --log-payloads
+    python benchmarks/bench_normalize.py --devices 20000 --batch
+"""
+import argparse
+import copy
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fleet import make_fleet  # noqa: E402
+from flask.logging import default_handler  # noqa: E402
+from app import create_app  # noqa: E402
+from app.utils.genieacs import GenieACS  # noqa: E402
+
+
+def run(devices, log_level, repeat, log_payloads=False, batch_mode=False):
+    app = create_app()
+    app.config['GENIEACS_LOG_PAYLOADS'] = log_payloads
+    app.logger.removeHandler(default_handler)
+    handler = logging.FileHandler(os.devnull)
+    app.logger.addHandler(handler)
+    app.logger.setLevel(log_level)
+
+    fleet = make_fleet(devices)
+    best = None
+    with app.app_context():
+        client = GenieACS()
+        for _ in range(repeat):
+            batch = copy.deepcopy(fleet)
+            start = time.perf_counter()
+            if batch_mode:
+                client._normalize_devices(batch)
+            else:
+                for device in batch:
+                    client._normalize_device(device)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+    app.logger.removeHandler(handler)
+    handler.close()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=2000)
+    parser.add_argument('--log-level', default='INFO')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--log-payloads', action='store_true',
+                        help='开启 GENIEACS_LOG_PAYLOADS（需配合 DEBUG 级别）')
+    parser.add_argument('--batch', action='store_true',
+                        help='使用批量标准化 _normalize_devices')
+    args = parser.parse_args()
+
+    best = run(args.devices, args.log_level.upper(), args.repeat, args.log_payloads, args.batch)
+    print(f"devices={args.devices} log_level={args.log_level.upper()} log_payloads={args.log_payloads} "
+          f"batch={args.batch} "
+          f"total={best * 1000:.1f}ms per_device={best / args.devices * 1e6:.1f}us")
+
+
+if __name__ == '__main__':
+    main()
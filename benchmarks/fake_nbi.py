@@ -0,0 +1,262 @@
+"""本地 GenieACS NBI 替身，用于基准和压力测试
+
+在本机端口上提供 GET /devices（query/projection/sort/skip/limit）以及客户端使用的
+POST /devices/<id>/reboot、/factory_reset、/parameters。设备数据由 fleet.make_device 生成，
+为支撑 20 万台设备，常驻内存的只有设备的顶层字段，完整的 InternetGatewayDevice 参数树在
+请求需要时按设备序号重新生成（同一序号的结果确定）。
+
+query 支持 GenieACS 常用的 MongoDB 子集：字段相等、$gt/$gte/$lt/$lte/$ne/$in/$regex、$or/$and。
+
+用法:
+    python -m benchmarks.fake_nbi --devices 10000 --port 7557
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+from benchmarks.fleet import make_device
+
+SUMMARY_FIELDS = ('_id', '_deviceId', '_lastInform', '_registered', '_lastBoot')
+
+
+def _get_path(document, path):
+    value = document
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _compare(value, operator, operand):
+    if operator == '$ne':
+        return value != operand
+    if operator == '$in':
+        return value in operand
+    if operator == '$regex':
+        return value is not None and re.search(operand, str(value)) is not None
+    if value is None:
+        return False
+    if operator == '$gt':
+        return value > operand
+    if operator == '$gte':
+        return value >= operand
+    if operator == '$lt':
+        return value < operand
+    if operator == '$lte':
+        return value <= operand
+    raise ValueError(f"unsupported operator {operator}")
+
+
+def matches(document, query):
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(matches(document, sub) for sub in condition):
+                return False
+        elif key == '$and':
+            if not all(matches(document, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+            value = _get_path(document, key)
+            if not all(_compare(value, operator, operand) for operator, operand in condition.items()):
+                return False
+        elif _get_path(document, key) != condition:
+            return False
+    return True
+
+
+def project(document, fields):
+    if not fields:
+        return document
+    result = {}
+    for field in fields:
+        value = _get_path(document, field)
+        if value is None:
+            continue
+        target = result
+        parts = field.split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return result
+
+
+class FakeFleet:
+    """合成设备清单，只常驻顶层字段"""
+
+    def __init__(self, size, seed=0, **device_kwargs):
+        self.seed = seed
+        self.now = datetime.now(timezone.utc)
+        self.device_kwargs = device_kwargs
+        self.summaries = []
+        self.index_by_id = {}
+        self.removed = set()
+        for index in range(size):
+            device = self.full(index)
+            self.summaries.append({field: device[field] for field in SUMMARY_FIELDS})
+            self.index_by_id[device['_id']] = index
+
+    def full(self, index):
+        device = make_device(index, self.now, random.Random(self.seed * 1000003 + index), **self.device_kwargs)
+        if self.summaries[index:]:
+            # inform() 只更新常驻的顶层字段，完整文档需以其为准
+            device.update(self.summaries[index])
+        return device
+
+    @staticmethod
+    def _needs_tree(fields):
+        return not fields or any(not field.startswith(SUMMARY_FIELDS) for field in fields)
+
+    def find(self, query=None, fields=None, sort=None, skip=0, limit=0):
+        query = query or {}
+        # 只有 _id 相等的查询（详情页）直接定位，避免全表扫描
+        if set(query) == {'_id'} and isinstance(query['_id'], str):
+            index = self.index_by_id.get(query['_id'])
+            candidates = [] if index is None or index in self.removed else [index]
+        else:
+            candidates = (i for i in range(len(self.summaries)) if i not in self.removed)
+
+        query_needs_tree = any(not key.startswith(SUMMARY_FIELDS) and not key.startswith('$')
+                               for key in query)
+        needs_tree = self._needs_tree(fields)
+        matched = []
+        for index in candidates:
+            document = self.full(index) if query_needs_tree else self.summaries[index]
+            if matches(document, query):
+                matched.append((index, document))
+
+        for key, direction in reversed(list((sort or {}).items())):
+            matched.sort(key=lambda item: str(_get_path(item[1], key) or ''), reverse=direction < 0)
+        if skip:
+            matched = matched[skip:]
+        if limit:
+            matched = matched[:limit]
+
+        return [project(self.full(index) if needs_tree and document is self.summaries[index] else document,
+                        fields)
+                for index, document in matched]
+
+    def remove(self, device_id):
+        """模拟设备被删除"""
+        index = self.index_by_id.get(device_id)
+        if index is not None:
+            self.removed.add(index)
+
+    def inform(self, count=1):
+        """模拟 count 台设备刚刚 Inform"""
+        stamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        for index in random.sample(range(len(self.summaries)), min(count, len(self.summaries))):
+            self.summaries[index]['_lastInform'] = stamp
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，保持连接时需关闭 Nagle 以免触发 40ms 的延迟确认
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stats['bytes'] += len(body)
+
+    def _delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def do_GET(self):
+        self.server.stats['get'] += 1
+        self._delay()
+        url = urlparse(self.path)
+        if url.path != '/devices':
+            return self._send_json({'error': 'not found'}, 404)
+        args = parse_qs(url.query)
+        try:
+            query = json.loads(args['query'][0]) if 'query' in args else None
+            fields = args['projection'][0].split(',') if 'projection' in args else None
+            sort = json.loads(args['sort'][0]) if 'sort' in args else None
+            skip = int(args.get('skip', [0])[0])
+            limit = int(args.get('limit', [0])[0])
+        except (ValueError, KeyError) as e:
+            return self._send_json({'error': str(e)}, 400)
+        self._send_json(self.server.fleet.find(query, fields, sort, skip, limit))
+
+    def do_POST(self):
+        self.server.stats['post'] += 1
+        self._delay()
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        parts = unquote(urlparse(self.path).path).strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'devices' or parts[1] not in self.server.fleet.index_by_id:
+            return self._send_json({'error': 'not found'}, 404)
+        self._send_json({'device': parts[1], 'task': parts[2], 'status': 'queued'})
+
+
+class FakeNBI:
+    """在后台线程中运行的 NBI 替身，可用作上下文管理器"""
+
+    def __init__(self, devices=1000, seed=0, host='127.0.0.1', port=0, latency=0.0, **device_kwargs):
+        self.fleet = FakeFleet(devices, seed, **device_kwargs)
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.fleet = self.fleet
+        self.server.latency = latency
+        self.server.stats = {'get': 0, 'post': 0, 'bytes': 0}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def stats(self):
+        return self.server.stats
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-nbi', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7557)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求附加的延迟（秒）')
+    args = parser.parse_args()
+
+    nbi = FakeNBI(args.devices, args.seed, args.host, args.port, args.latency)
+    print(f"Fake NBI with {args.devices} devices listening on {nbi.url}")
+    try:
+        nbi.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""合成设备数据，用于基准测试"""
+import random
+from datetime import datetime, timedelta, timezone
+
+MANUFACTURERS = (('Huawei', '00259E', 'HG8245H'),
+                 ('ZTE', '001E73', 'F660'),
+                 ('FiberHome', '0C4B54', 'AN5506-04'),
+                 ('TP-Link', '50C7BF', 'Archer-C5'))
+
+
+def _iso(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _leaf(value, type_, timestamp, writable=False):
+    return {'_value': value, '_type': type_, '_timestamp': timestamp, '_writable': writable}
+
+
+def _object(children, timestamp, writable=False):
+    node = {'_object': True, '_writable': writable, '_timestamp': timestamp}
+    node.update(children)
+    return node
+
+
+def make_device(index, now=None, rng=random, wan_connections=2, hosts=8):
+    """生成一台带 InternetGatewayDevice 参数树的设备，结构与 GenieACS NBI 返回一致"""
+    now = now or datetime.now(timezone.utc)
+    manufacturer, oui, product_class = MANUFACTURERS[index % len(MANUFACTURERS)]
+    serial = f'{oui}{index:010d}'
+    last_inform = now - timedelta(seconds=rng.randint(0, 3600))
+    ts = _iso(last_inform)
+
+    wan = {}
+    for i in range(1, wan_connections + 1):
+        wan[str(i)] = _object({
+            'WANIPConnection': _object({'1': _object({
+                'Enable': _leaf(True, 'xsd:boolean', ts, True),
+                'ConnectionStatus': _leaf('Connected', 'xsd:string', ts),
+                'ExternalIPAddress': _leaf(f'10.{index % 250}.{i}.{index % 200 + 1}', 'xsd:string', ts),
+                'DNSServers': _leaf('8.8.8.8,114.114.114.114', 'xsd:string', ts, True),
+                'MACAddress': _leaf('00:11:22:%02x:%02x:%02x' % (i, index % 256, (index >> 8) % 256),
+                                    'xsd:string', ts),
+            }, ts, True)}, ts),
+        }, ts)
+
+    host_entries = {}
+    for i in range(1, hosts + 1):
+        host_entries[str(i)] = _object({
+            'HostName': _leaf(f'host-{i}', 'xsd:string', ts),
+            'IPAddress': _leaf(f'192.168.1.{i + 1}', 'xsd:string', ts),
+            'MACAddress': _leaf('aa:bb:cc:dd:%02x:%02x' % (i, index % 256), 'xsd:string', ts),
+            'Active': _leaf(bool(i % 2), 'xsd:boolean', ts),
+        }, ts)
+
+    return {
+        '_id': f'{oui}-{product_class}-{serial}',
+        '_deviceId': {'_Manufacturer': manufacturer, '_OUI': oui,
+                      '_ProductClass': product_class, '_SerialNumber': serial},
+        '_lastInform': ts,
+        '_registered': _iso(now - timedelta(days=rng.randint(1, 365))),
+        '_lastBoot': ts,
+        'InternetGatewayDevice': _object({
+            'DeviceInfo': _object({
+                'Manufacturer': _leaf(manufacturer, 'xsd:string', ts),
+                'ModelName': _leaf(product_class, 'xsd:string', ts),
+                'SerialNumber': _leaf(serial, 'xsd:string', ts),
+                'SoftwareVersion': _leaf(f'V{index % 5}.0.{index % 17}', 'xsd:string', ts),
+                'HardwareVersion': _leaf('HW1.0', 'xsd:string', ts),
+                'UpTime': _leaf(rng.randint(60, 10 ** 6), 'xsd:unsignedInt', ts),
+            }, ts),
+            'ManagementServer': _object({
+                'URL': _leaf('http://acs.example.com:7547', 'xsd:string', ts, True),
+                'PeriodicInformEnable': _leaf(True, 'xsd:boolean', ts, True),
+                'PeriodicInformInterval': _leaf(300, 'xsd:unsignedInt', ts, True),
+                'ConnectionRequestURL': _leaf(f'http://10.0.0.{index % 250}:7547/', 'xsd:string', ts),
+            }, ts),
+            'WANDevice': _object({'1': _object({'WANConnectionDevice': _object(wan, ts)}, ts)}, ts),
+            'LANDevice': _object({'1': _object({'Hosts': _object({
+                'HostNumberOfEntries': _leaf(hosts, 'xsd:unsignedInt', ts),
+                'Host': _object(host_entries, ts),
+            }, ts)}, ts)}, ts),
+        }, ts),
+    }
+
+
+def make_fleet(size, seed=0, **kwargs):
+    """生成 size 台设备"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    return [make_device(i, now, rng, **kwargs) for i in range(size)]
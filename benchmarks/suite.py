@@ -0,0 +1,348 @@
+"""基准与压力测试套件
+
+针对本地 NBI 替身（fake_nbi.py）测量 GenieACS 客户端、标准化、参数展开以及经 Flask 测试客户端
+渲染的各个路由的延迟、吞吐量和进程内存峰值，结果写入 JSON 文件，便于在版本之间比较回归。
+
+默认关闭清单缓存以测量完整路径，--cache 保留缓存。内存峰值为进程级 ru_maxrss，只增不减；
+如需只统计应用本身，可用 python -m benchmarks.fake_nbi 单独启动替身并通过 --nbi-url 指定。
+
+用法:
+    python -m benchmarks.suite --devices 1000 10000 --output results.json
+    python -m benchmarks.suite --devices 1000 --only route_ --compare baseline.json
+    python -m benchmarks.suite --devices 200000 --iterations 3 --max-seconds 60
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_nbi import FakeNBI  # noqa: E402
+from benchmarks.fleet import make_fleet  # noqa: E402
+
+# 结果比较时 p50 变慢超过该比例视为回归
+REGRESSION_THRESHOLD = 0.10
+
+
+def _rss_mb():
+    """当前 RSS，非 Linux 平台返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _summarize(name, devices, timings, units=1, extra=None):
+    """timings 为每次迭代的秒数，units 为每次迭代处理的对象数（如设备数）"""
+    total = sum(timings)
+    result = {
+        'name': name,
+        'devices': devices,
+        'iterations': len(timings),
+        'mean_ms': statistics.mean(timings) * 1000,
+        'p50_ms': _percentile(timings, 0.50) * 1000,
+        'p95_ms': _percentile(timings, 0.95) * 1000,
+        'max_ms': max(timings) * 1000,
+        'ops_per_sec': len(timings) * units / total if total else None,
+        'rss_mb': _rss_mb(),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+    if units != 1:
+        result['per_unit_us'] = total / (len(timings) * units) * 1e6
+    if extra:
+        result.update(extra)
+    return result
+
+
+def _repeat(func, iterations, max_seconds):
+    """重复执行 func，达到次数或超过时长即停止（至少执行一次）"""
+    func()  # 预热
+    timings = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+        if time.perf_counter() > deadline:
+            break
+    return timings
+
+
+class Suite:
+    def __init__(self, app, client, nbi_stats, iterations, max_seconds, concurrency, load_seconds):
+        self.app = app
+        self.client = client
+        self.nbi_stats = nbi_stats
+        self.iterations = iterations
+        self.max_seconds = max_seconds
+        self.concurrency = concurrency
+        self.load_seconds = load_seconds
+
+    def benchmarks(self):
+        return [
+            ('normalize_device', self.bench_normalize_device),
+            ('normalize_devices', self.bench_normalize_devices),
+            ('get_devices_page', self.bench_get_devices_page),
+            ('get_devices_full', self.bench_get_devices_full),
+            ('get_device_parameters', self.bench_get_device_parameters),
+            ('route_devices', self.route('/devices?limit=50')),
+            ('route_api_devices', self.route('/api/devices?limit=500')),
+            ('route_api_devices_stream', self.route('/api/devices?stream=1')),
+            ('route_device_detail', self.route_detail),
+            ('load_api_devices', self.bench_load),
+        ]
+
+    def _genieacs(self):
+        from app.utils.genieacs import GenieACS
+        return GenieACS()
+
+    def bench_normalize_device(self, devices, device_ids):
+        from app.utils.normalize import normalize_device
+
+        fleet = make_fleet(min(devices, 5000))
+        timings = []
+        for _ in range(self.iterations):
+            batch = copy.deepcopy(fleet)
+            started = time.perf_counter()
+            for device in batch:
+                normalize_device(device)
+            timings.append(time.perf_counter() - started)
+        return timings, len(fleet)
+
+    def bench_normalize_devices(self, devices, device_ids):
+        from app.utils.normalize import normalize_devices
+
+        fleet = make_fleet(min(devices, 5000))
+        timings = []
+        for _ in range(self.iterations):
+            batch = copy.deepcopy(fleet)
+            started = time.perf_counter()
+            normalize_devices(batch)
+            timings.append(time.perf_counter() - started)
+        return timings, len(fleet)
+
+    def bench_get_devices_page(self, devices, device_ids):
+        from app.utils.genieacs import DEVICE_LIST_PROJECTION
+        genieacs = self._genieacs()
+        return _repeat(lambda: genieacs.get_devices(projection=DEVICE_LIST_PROJECTION, limit=50,
+                                                    sort={'_id': 1}),
+                       self.iterations, self.max_seconds), 1
+
+    def bench_get_devices_full(self, devices, device_ids):
+        from app.utils.genieacs import DEVICE_LIST_PROJECTION
+        genieacs = self._genieacs()
+        return _repeat(lambda: genieacs.get_devices(projection=DEVICE_LIST_PROJECTION),
+                       self.iterations, self.max_seconds), 1
+
+    def bench_get_device_parameters(self, devices, device_ids):
+        genieacs = self._genieacs()
+        return _repeat(lambda: genieacs.get_device_parameters(random.choice(device_ids), 'InternetGatewayDevice'),
+                       self.iterations, self.max_seconds), 1
+
+    def route(self, path):
+        def bench(devices, device_ids):
+            def request():
+                response = self.client.get(path)
+                assert response.status_code == 200, (path, response.status_code)
+                response.get_data()
+            return _repeat(request, self.iterations, self.max_seconds), 1
+        return bench
+
+    def route_detail(self, devices, device_ids):
+        def request():
+            response = self.client.get(f'/devices/{random.choice(device_ids)}')
+            assert response.status_code == 200, response.status_code
+        return _repeat(request, self.iterations, self.max_seconds), 1
+
+    def bench_load(self, devices, device_ids):
+        """concurrency 个线程在 load_seconds 内持续请求 /api/devices?limit=50"""
+        timings = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + self.load_seconds
+
+        def worker():
+            client = self.app.test_client()
+            local = []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = client.get('/api/devices?limit=50')
+                response.get_data()
+                local.append(time.perf_counter() - started)
+            with lock:
+                timings.extend(local)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return timings, 1, {'concurrency': self.concurrency,
+                            'throughput_rps': len(timings) / elapsed if elapsed else None}
+
+    def run(self, devices, device_ids, only=None):
+        results = []
+        for name, bench in self.benchmarks():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            nbi_before = dict(self.nbi_stats) if self.nbi_stats is not None else None
+            outcome = bench(devices, device_ids)
+            timings, units = outcome[:2]
+            extra = outcome[2] if len(outcome) > 2 else {}
+            if nbi_before is not None:
+                extra['nbi_requests'] = self.nbi_stats['get'] - nbi_before['get']
+                extra['nbi_bytes'] = self.nbi_stats['bytes'] - nbi_before['bytes']
+            result = _summarize(name, devices, timings, units, extra)
+            results.append(result)
+            print(f"{name:28} devices={devices:<7} p50={result['p50_ms']:10.2f}ms "
+                  f"p95={result['p95_ms']:10.2f}ms peak_rss={result['peak_rss_mb']:.0f}MB", flush=True)
+        return results
+
+
+def _create_app(nbi_url, cache):
+    os.environ['GENIEACS_URL'] = nbi_url
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+    from flask.logging import default_handler
+    from app import create_app, db
+    from app.models.user import User
+
+    app = create_app()
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(logging.FileHandler(os.devnull))
+    app.logger.setLevel(logging.WARNING)
+    if not cache:
+        app.config['INVENTORY_CACHE'].ttl = 0
+
+    with app.app_context():
+        db.create_all()
+        if not User.query.filter_by(username='bench').first():
+            user = User(username='bench', email='bench@example.com')
+            user.set_password('bench')
+            db.session.add(user)
+            db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    return app, client
+
+
+def _metadata(args):
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        'revision': revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'cache': args.cache,
+        'iterations': args.iterations,
+        'concurrency': args.concurrency,
+    }
+
+
+def compare(results, baseline_path):
+    """与基线结果比较 p50，返回回归项数"""
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['devices']): r for r in json.load(f)['results']}
+    regressions = 0
+    print(f"\n{'benchmark':28} {'devices':>8} {'baseline':>12} {'current':>12} {'change':>8}")
+    for result in results:
+        old = baseline.get((result['name'], result['devices']))
+        if old is None:
+            continue
+        change = result['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0
+        flag = ' !' if change > REGRESSION_THRESHOLD else ''
+        regressions += bool(flag)
+        print(f"{result['name']:28} {result['devices']:>8} {old['p50_ms']:>10.2f}ms "
+              f"{result['p50_ms']:>10.2f}ms {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='+', default=[1000])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--max-seconds', type=float, default=30, help='单项基准的最长运行时间')
+    parser.add_argument('--concurrency', type=int, default=8, help='压力测试的并发线程数')
+    parser.add_argument('--load-seconds', type=float, default=5)
+    parser.add_argument('--only', nargs='*', help='只运行名称以这些前缀开头的基准')
+    parser.add_argument('--cache', action='store_true', help='保留清单缓存')
+    parser.add_argument('--nbi-url', help='使用已启动的 NBI 替身，此时 --devices 只能指定一个值')
+    parser.add_argument('--nbi-latency', type=float, default=0.0, help='进程内替身每个请求附加的延迟（秒）')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='与之前的结果文件比较')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    results = []
+    app = client = None
+    for devices in args.devices:
+        nbi = None
+        if args.nbi_url:
+            nbi_url, nbi_stats = args.nbi_url, None
+        else:
+            started = time.perf_counter()
+            nbi = FakeNBI(devices, latency=args.nbi_latency).start()
+            nbi_url, nbi_stats = nbi.url, nbi.stats
+            print(f"Generated fake NBI with {devices} devices in {time.perf_counter() - started:.1f}s", flush=True)
+
+        if app is None:
+            app, client = _create_app(nbi_url, args.cache)
+        app.config['GENIEACS_URL'] = nbi_url
+        app.config['INVENTORY_CACHE'].clear()
+
+        if nbi is not None:
+            device_ids = [summary['_id'] for summary in nbi.fleet.summaries]
+        else:
+            with app.app_context():
+                from app.utils.genieacs import GenieACS
+                device_ids = [d['_id'] for d in GenieACS().iter_devices(projection=('_id',), normalize=False)]
+
+        suite = Suite(app, client, nbi_stats, args.iterations, args.max_seconds,
+                      args.concurrency, args.load_seconds)
+        with app.app_context():
+            results.extend(suite.run(devices, device_ids, args.only))
+        if nbi is not None:
+            nbi.stop()
+
+    with open(args.output, 'w') as f:
+        json.dump({'meta': _metadata(args), 'results': results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from sqlalchemy.pool import QueuePool
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env'))
@@ -9,8 +10,116 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite 连接池与 WAL：Flask-SQLAlchemy 默认对 SQLite 文件库使用 NullPool，每个请求都会重新打开连接；
+    # 配置连接池后复用连接，WAL 模式下读请求不会被后台同步、批量任务的写入阻塞
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 10)
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW') or 20)
+    SQLITE_WAL = (os.environ.get('SQLITE_WAL') or 'true').lower() in ('1', 'true', 'yes')
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5)
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        # 内存库由 Flask-SQLAlchemy 使用 StaticPool，不能设置连接池大小
+        if SQLALCHEMY_DATABASE_URI not in ('sqlite://', 'sqlite:///:memory:'):
+            SQLALCHEMY_ENGINE_OPTIONS = {
+                'poolclass': QueuePool,
+                'pool_size': DATABASE_POOL_SIZE,
+                'max_overflow': DATABASE_MAX_OVERFLOW,
+                'connect_args': {'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT},
+            }
+    else:
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            'pool_size': DATABASE_POOL_SIZE,
+            'max_overflow': DATABASE_MAX_OVERFLOW,
+            'pool_pre_ping': True,
+        }
+
+    # load_user 用户缓存时长（秒），0 表示每个请求都查询数据库
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL') or 60)
     
     # GENIEACS 配置
     GENIEACS_URL = os.environ.get('GENIEACS_URL') or 'http://localhost:7557'
     GENIEACS_USERNAME = os.environ.get('GENIEACS_USERNAME') or 'admin'
-    GENIEACS_PASSWORD = os.environ.get('GENIEACS_PASSWORD') or 'admin' 
\ No newline at end of file
+    GENIEACS_PASSWORD = os.environ.get('GENIEACS_PASSWORD') or 'admin'
+
+    # GENIEACS 连接池与超时（秒）
+    GENIEACS_POOL_SIZE = int(os.environ.get('GENIEACS_POOL_SIZE') or 20)
+    GENIEACS_CONNECT_TIMEOUT = float(os.environ.get('GENIEACS_CONNECT_TIMEOUT') or 3.05)
+    GENIEACS_READ_TIMEOUT = float(os.environ.get('GENIEACS_READ_TIMEOUT') or 30)
+    GENIEACS_RETRIES = int(os.environ.get('GENIEACS_RETRIES') or 3)
+    GENIEACS_RETRY_BACKOFF = float(os.environ.get('GENIEACS_RETRY_BACKOFF') or 0.3)
+
+    # GENIEACS 熔断：连续失败 FAILURES 次后打开，RESET 秒后放行一个探测请求；FAILURES 为 0 时不熔断
+    GENIEACS_CIRCUIT_FAILURES = int(os.environ.get('GENIEACS_CIRCUIT_FAILURES') or 5)
+    GENIEACS_CIRCUIT_RESET = float(os.environ.get('GENIEACS_CIRCUIT_RESET') or 30)
+
+    # GENIEACS 载荷日志：仅在开启且日志级别为 DEBUG 时按采样率输出，超长内容会被截断
+    GENIEACS_LOG_PAYLOADS = (os.environ.get('GENIEACS_LOG_PAYLOADS') or '').lower() in ('1', 'true', 'yes')
+    GENIEACS_LOG_SAMPLE_RATE = float(os.environ.get('GENIEACS_LOG_SAMPLE_RATE') or 1.0)
+    GENIEACS_LOG_PAYLOAD_MAX_CHARS = int(os.environ.get('GENIEACS_LOG_PAYLOAD_MAX_CHARS') or 4000)
+
+    # 设备清单缓存：TTL 内直接命中，过期后 STALE_TTL 内先返回旧数据再后台刷新
+    # BACKEND 为 memory（进程内）或 sqlite（同主机多进程共享）
+    INVENTORY_CACHE_TTL = float(os.environ.get('INVENTORY_CACHE_TTL') or 15)
+    INVENTORY_CACHE_STALE_TTL = float(os.environ.get('INVENTORY_CACHE_STALE_TTL') or 60)
+    INVENTORY_CACHE_BACKEND = os.environ.get('INVENTORY_CACHE_BACKEND') or 'memory'
+    INVENTORY_CACHE_PATH = os.environ.get('INVENTORY_CACHE_PATH') or \
+        os.path.join(basedir, 'inventory_cache.db')
+    # 缓存容量：最多缓存 MAX_ENTRIES 个 key（memory 后端按最近使用淘汰，sqlite 后端按获取时间淘汰），
+    # 条目保留 MAX_AGE 秒后清除，MAX_AGE 同时是 GenieACS 不可用时可退回的旧数据的最长时间
+    INVENTORY_CACHE_MAX_ENTRIES = int(os.environ.get('INVENTORY_CACHE_MAX_ENTRIES') or 5000)
+    INVENTORY_CACHE_MAX_AGE = float(os.environ.get('INVENTORY_CACHE_MAX_AGE') or 3600)
+
+    # 同步、导出等后台任务遍历 NBI 时的每页设备数
+    GENIEACS_PAGE_SIZE = int(os.environ.get('GENIEACS_PAGE_SIZE') or 1000)
+
+    # 设备数据来源：nbi 直接查询 GenieACS，local 读取 sync-devices 同步的本地 device 表
+    DEVICE_SOURCE = os.environ.get('DEVICE_SOURCE') or 'nbi'
+    # 后台增量同步间隔（秒），0 表示不启动后台线程；每 FULL_EVERY 次增量同步后做一次全量比对以清理已删除设备
+    DEVICE_SYNC_INTERVAL = float(os.environ.get('DEVICE_SYNC_INTERVAL') or 0)
+    DEVICE_SYNC_FULL_EVERY = int(os.environ.get('DEVICE_SYNC_FULL_EVERY') or 60)
+
+    # 增量变化接口：游标回溯的重叠秒数、删除检测的扫描间隔与保留时长（秒）
+    DEVICE_CHANGES_OVERLAP = float(os.environ.get('DEVICE_CHANGES_OVERLAP') or 60)
+    DEVICE_REMOVAL_SCAN_INTERVAL = float(os.environ.get('DEVICE_REMOVAL_SCAN_INTERVAL') or 300)
+    DEVICE_REMOVAL_RETENTION = float(os.environ.get('DEVICE_REMOVAL_RETENTION') or 3600)
+
+    # SSE 设备事件推送：watcher 轮询间隔、每个订阅者的队列长度、保活间隔（秒）
+    DEVICE_EVENTS_INTERVAL = float(os.environ.get('DEVICE_EVENTS_INTERVAL') or 15)
+    DEVICE_EVENTS_QUEUE_SIZE = int(os.environ.get('DEVICE_EVENTS_QUEUE_SIZE') or 1000)
+    DEVICE_EVENTS_KEEPALIVE = float(os.environ.get('DEVICE_EVENTS_KEEPALIVE') or 15)
+    # 是否向页面推送 SSE（worker 不支持并发连接时自动关闭），关闭时页面按 POLL_INTERVAL 秒轮询
+    DEVICE_EVENTS_SSE = (os.environ.get('DEVICE_EVENTS_SSE') or 'true').lower() in ('1', 'true', 'yes')
+    DEVICE_EVENTS_POLL_INTERVAL = int(os.environ.get('DEVICE_EVENTS_POLL_INTERVAL') or 30)
+
+    # 设备在线/离线历史：由 SSE watcher 写入进程内环形缓冲区，开启后 watcher 随第一个请求启动并常驻
+    # TRANSITIONS/INFORMS 为每台设备保留的状态变化和 Inform 次数，MAX_EVENTS 为全网状态变化日志的容量
+    DEVICE_HISTORY_ENABLED = (os.environ.get('DEVICE_HISTORY_ENABLED') or '').lower() in ('1', 'true', 'yes')
+    DEVICE_HISTORY_TRANSITIONS = int(os.environ.get('DEVICE_HISTORY_TRANSITIONS') or 32)
+    DEVICE_HISTORY_INFORMS = int(os.environ.get('DEVICE_HISTORY_INFORMS') or 32)
+    DEVICE_HISTORY_MAX_EVENTS = int(os.environ.get('DEVICE_HISTORY_MAX_EVENTS') or 1000000)
+
+    # 设备搜索索引的增量刷新间隔（秒）
+    DEVICE_SEARCH_REFRESH = float(os.environ.get('DEVICE_SEARCH_REFRESH') or 30)
+
+    # 批量任务：并发下发数、每秒最多下发的任务数（0 为不限）、每完成多少台设备写回一次进度
+    BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY') or 8)
+    BULK_RATE_LIMIT = float(os.environ.get('BULK_RATE_LIMIT') or 20)
+    BULK_COMMIT_EVERY = int(os.environ.get('BULK_COMMIT_EVERY') or 50)
+    # 调度线程每 RECOVER_INTERVAL 秒认领无人执行的 pending 任务，以及心跳超过 STALE_TIMEOUT 秒的 running 任务
+    BULK_RECOVER_INTERVAL = float(os.environ.get('BULK_RECOVER_INTERVAL') or 60)
+    BULK_STALE_TIMEOUT = float(os.environ.get('BULK_STALE_TIMEOUT') or 300)
+
+    # 性能指标：/metrics 输出 Prometheus 文本格式；SERVER_TIMING_ENABLED 为每个响应附加各阶段耗时
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    SERVER_TIMING_ENABLED = (os.environ.get('SERVER_TIMING_ENABLED') or '').lower() in ('1', 'true', 'yes')
+
+    # 响应压缩：不小于 MIN_SIZE 字节的文本响应按 Accept-Encoding 使用 br（需安装 brotli）或 gzip，0 表示关闭
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 500)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)
+    # 按清单版本缓存的渲染片段数（进程内 LRU），0 表示不缓存
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 256)
+
+    # 设备列表分页
+    DEVICES_PER_PAGE = int(os.environ.get('DEVICES_PER_PAGE') or 50)
+    DEVICES_MAX_PER_PAGE = int(os.environ.get('DEVICES_MAX_PER_PAGE') or 500)
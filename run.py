@@ -1,5 +1,8 @@
+import click
 from app import create_app, db
 from app.models.user import User
+from app.models.device import Device
+from app.models.bulk_job import BulkJob, BulkJobItem
 
 app = create_app()
 
@@ -16,5 +19,43 @@ def init_db():
         db.session.commit()
         print('Admin user created')
 
+@app.cli.command("sync-devices")
+@click.option('--full', is_flag=True, help='全量同步并删除 GenieACS 中已不存在的设备')
+def sync_devices_command(full):
+    """Sync the GenieACS inventory into the local device table."""
+    from app.utils.device_sync import ensure_device_table, sync_devices
+
+    ensure_device_table()
+    stats = sync_devices(full=full)
+    print(f"Synced {stats['upserted']} devices, deleted {stats['deleted']}, "
+          f"marked {stats['marked_offline']} offline in {stats['elapsed']}s")
+
+@app.cli.command("export-devices")
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson', 'parquet']), default='csv')
+@click.option('--fields', default='', help='逗号分隔的字段或参数路径，默认导出基本信息')
+@click.option('--status', type=click.Choice(['online', 'offline']))
+@click.option('--manufacturer')
+@click.option('--product-class')
+@click.option('--output', '-o', default='-', help='输出文件，- 表示标准输出')
+def export_devices_command(fmt, fields, status, manufacturer, product_class, output):
+    """Stream the GenieACS inventory to a CSV, NDJSON or Parquet file."""
+    import sys
+    import time
+    from app.utils.export import DEFAULT_EXPORT_FIELDS, export_devices
+    from app.utils.genieacs import GenieACS, build_device_query
+
+    fields = [f.strip() for f in fields.split(',') if f.strip()] or DEFAULT_EXPORT_FIELDS
+    query = build_device_query(status=status, manufacturer=manufacturer, product_class=product_class)
+    stats = {'devices': 0}
+    started = time.time()
+    try:
+        chunks = export_devices(GenieACS(), fmt, fields, query, stats)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    with click.open_file(output, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+    print(f"Exported {stats['devices']} devices in {time.time() - started:.1f}s", file=sys.stderr)
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
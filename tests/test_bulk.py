@@ -0,0 +1,270 @@
+"""app.utils.bulk 的任务创建、限速、崩溃恢复和取消用例
+
+BulkTaskRunner 在测试线程中同步驱动（不启动调度线程），GenieACS 替换为记录调用的桩。
+调度器执行完会移除当前线程的 session，之后需按 ID 重新查询任务。
+"""
+import threading
+import types
+from datetime import datetime, timedelta
+import pytest
+import requests
+from config import Config
+from app import create_app, db
+from app.models.bulk_job import BulkJob, BulkJobItem
+from app.utils import bulk
+from app.utils.bulk import BulkTaskRunner, RateLimiter, create_job, cancel_job
+
+
+class StubGenieACS:
+    """记录下发的设备操作；fleet 为按查询遍历时返回的设备 ID"""
+    calls = []
+    fleet = []
+    fail_after = None
+    _lock = threading.Lock()
+
+    def iter_device_pages(self, query=None, projection=None, normalize=True):
+        for start in range(0, len(self.fleet), 3):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise requests.exceptions.ConnectionError('NBI unavailable')
+            yield [{'_id': device_id} for device_id in self.fleet[start:start + 3]]
+
+    def _record(self, *call):
+        with self._lock:
+            self.calls.append(call)
+        return {'status': 'queued'}
+
+    def reboot_device(self, device_id):
+        return self._record('reboot', device_id)
+
+    def factory_reset(self, device_id):
+        return self._record('factory_reset', device_id)
+
+    def set_parameter(self, device_id, parameter, value):
+        return self._record('set_parameter', device_id, parameter, value)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'bulk.db'}")
+    monkeypatch.setattr(Config, 'SQLALCHEMY_ENGINE_OPTIONS', {})
+    monkeypatch.setattr(StubGenieACS, 'calls', [])
+    monkeypatch.setattr(StubGenieACS, 'fleet', [])
+    monkeypatch.setattr(bulk, 'GenieACS', StubGenieACS)
+    app = create_app()
+    app.config.update(BULK_CONCURRENCY=2, BULK_RATE_LIMIT=0, BULK_COMMIT_EVERY=5, BULK_STALE_TIMEOUT=300)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """RateLimiter 使用的时钟，sleep 直接推进时间并记录等待时长"""
+    now = types.SimpleNamespace(value=100.0, slept=[])
+
+    def sleep(seconds):
+        now.slept.append(seconds)
+        now.value += seconds
+
+    monkeypatch.setattr(bulk, 'time', types.SimpleNamespace(monotonic=lambda: now.value, sleep=sleep))
+    return now
+
+
+def device_ids(count, prefix='dev'):
+    return [f'{prefix}-{i:03d}' for i in range(count)]
+
+
+def called_devices():
+    return sorted(call[1] for call in StubGenieACS.calls)
+
+
+def test_empty_query_requires_all(app):
+    with pytest.raises(ValueError):
+        create_job('reboot', query={})
+    with pytest.raises(ValueError):
+        create_job('reboot')
+    assert BulkJob.query.count() == 0
+
+    StubGenieACS.fleet = device_ids(7)
+    job = create_job('reboot', query={}, all_devices=True)
+    assert job.status == 'pending' and job.total == 7
+    assert BulkJobItem.query.filter_by(job_id=job.id).count() == 7
+
+
+def test_create_job_deduplicates_ids_and_validates_arguments(app):
+    job = create_job('reboot', device_ids=['a', 'b', 'a', '', 'c'])
+    assert job.total == 3
+    with pytest.raises(ValueError):
+        create_job('set_parameter', device_ids=['a'])
+    with pytest.raises(ValueError):
+        create_job('unknown', device_ids=['a'])
+
+
+def test_empty_selection_completes_immediately(app):
+    job = create_job('reboot', query={'_id': 'missing'})
+    assert job.status == 'completed' and job.total == 0 and job.finished_at is not None
+
+
+def test_failed_creation_discards_items(app, monkeypatch):
+    monkeypatch.setattr(bulk, 'INSERT_CHUNK_SIZE', 2)
+    StubGenieACS.fleet = device_ids(10)
+    monkeypatch.setattr(StubGenieACS, 'fail_after', 6)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        create_job('reboot', query={'_deviceId._Manufacturer': 'Huawei'})
+
+    job = BulkJob.query.one()
+    assert job.status == 'failed' and 'NBI unavailable' in job.error
+    assert BulkJobItem.query.count() == 0
+
+
+def test_runs_job_to_completion(app):
+    job = create_job('set_parameter', device_ids=device_ids(12), arguments={'parameter': 'X.Y', 'value': '1'})
+    job_id = job.id
+    BulkTaskRunner(app)._process(job_id)
+
+    job = BulkJob.query.get(job_id)
+    assert job.status == 'completed' and job.succeeded == 12 and job.failed == 0
+    assert called_devices() == device_ids(12)
+    assert {call[2:] for call in StubGenieACS.calls} == {('X.Y', '1')}
+    assert BulkJobItem.query.filter_by(job_id=job_id, status='pending').count() == 0
+
+
+def test_failed_calls_are_recorded(app, monkeypatch):
+    monkeypatch.setattr(StubGenieACS, 'reboot_device', lambda self, device_id: None)
+    job = create_job('reboot', device_ids=device_ids(4))
+    job_id = job.id
+    BulkTaskRunner(app)._process(job_id)
+
+    job = BulkJob.query.get(job_id)
+    assert job.status == 'completed' and job.succeeded == 0 and job.failed == 4
+    assert {item.status for item in BulkJobItem.query.filter_by(job_id=job_id)} == {'failed'}
+
+
+def test_rate_limiter_spaces_acquisitions(clock):
+    limiter = RateLimiter(10)
+    for _ in range(5):
+        limiter.acquire()
+    assert sum(clock.slept) == pytest.approx(0.4)
+
+    clock.value += 10
+    clock.slept.clear()
+    limiter.acquire()
+    assert clock.slept == []
+
+
+def test_rate_limiter_disabled(clock):
+    limiter = RateLimiter(0)
+    for _ in range(100):
+        limiter.acquire()
+    assert clock.slept == []
+
+
+def test_runner_applies_rate_limit(app, clock):
+    app.config['BULK_RATE_LIMIT'] = 4
+    job = create_job('reboot', device_ids=device_ids(9))
+    job_id = job.id
+    BulkTaskRunner(app)._process(job_id)
+
+    assert len(StubGenieACS.calls) == 9
+    # 9 次下发间隔 8 个 0.25 秒
+    assert sum(clock.slept) == pytest.approx(2.0)
+
+
+def test_recover_resumes_stale_running_job(app):
+    job = create_job('reboot', device_ids=device_ids(30))
+    done = BulkJobItem.query.filter_by(job_id=job.id).order_by(BulkJobItem.id).limit(10).all()
+    for item in done:
+        item.status = 'succeeded'
+    job.status = 'running'
+    job.succeeded = 10
+    job.started_at = job.heartbeat_at = datetime.utcnow() - timedelta(hours=1)
+    db.session.commit()
+
+    job_id = job.id
+    BulkTaskRunner(app)._recover()
+
+    job = BulkJob.query.get(job_id)
+    assert job.status == 'completed' and job.succeeded == 30
+    # 只下发崩溃前未执行的设备
+    assert called_devices() == device_ids(30)[10:]
+
+
+def test_recover_claims_pending_job(app):
+    job = create_job('reboot', device_ids=device_ids(3))
+    job_id = job.id
+    BulkTaskRunner(app)._recover()
+    assert BulkJob.query.get(job_id).status == 'completed'
+    assert called_devices() == device_ids(3)
+
+
+def test_recover_leaves_live_running_job(app):
+    job = create_job('reboot', device_ids=device_ids(5))
+    job.status = 'running'
+    job.heartbeat_at = datetime.utcnow() - timedelta(seconds=60)
+    db.session.commit()
+
+    job_id = job.id
+    BulkTaskRunner(app)._recover()
+    assert BulkJob.query.get(job_id).status == 'running'
+    assert StubGenieACS.calls == []
+
+
+def test_recover_discards_abandoned_creating_job(app):
+    stale = BulkJob(action='reboot', status='creating', heartbeat_at=datetime.utcnow() - timedelta(hours=1))
+    live = BulkJob(action='reboot', status='creating', heartbeat_at=datetime.utcnow())
+    db.session.add_all([stale, live])
+    db.session.commit()
+    db.session.bulk_insert_mappings(BulkJobItem, [
+        {'job_id': job.id, 'device_id': device_id, 'status': 'pending'}
+        for job in (stale, live) for device_id in device_ids(3)])
+    db.session.commit()
+    stale_id, live_id = stale.id, live.id
+
+    BulkTaskRunner(app)._recover()
+    assert BulkJob.query.get(stale_id).status == 'failed'
+    assert BulkJobItem.query.filter_by(job_id=stale_id).count() == 0
+    assert BulkJob.query.get(live_id).status == 'creating'
+    assert BulkJobItem.query.filter_by(job_id=live_id).count() == 3
+    assert StubGenieACS.calls == []
+
+
+def test_claimed_job_is_not_run_twice(app):
+    job = create_job('reboot', device_ids=device_ids(4))
+    job_id = job.id
+    runner = BulkTaskRunner(app)
+    runner._process(job_id)
+    runner._process(job_id)
+    assert len(StubGenieACS.calls) == 4
+
+
+def test_cancel_stops_dispatch_after_current_chunk(app, monkeypatch):
+    monkeypatch.setattr(bulk, 'DISPATCH_CHUNK_SIZE', 5)
+    job = create_job('reboot', device_ids=device_ids(20))
+    job_id = job.id
+    acquire = RateLimiter.acquire
+
+    def cancel_on_first_dispatch(limiter):
+        # 在调度线程中取消，结果与调度进度无竞争
+        monkeypatch.setattr(RateLimiter, 'acquire', acquire)
+        assert cancel_job(BulkJob.query.get(job_id))
+        acquire(limiter)
+
+    monkeypatch.setattr(RateLimiter, 'acquire', cancel_on_first_dispatch)
+    BulkTaskRunner(app)._process(job_id)
+
+    job = BulkJob.query.get(job_id)
+    assert job.status == 'cancelled'
+    assert len(StubGenieACS.calls) == 5
+    assert BulkJobItem.query.filter_by(job_id=job_id, status='pending').count() == 15
+
+
+def test_cancel_job_only_affects_unfinished_jobs(app):
+    job = create_job('reboot', device_ids=device_ids(2))
+    assert cancel_job(job)
+    assert job.status == 'cancelled' and job.finished_at is not None
+    assert not cancel_job(job)
+
+    job_id = job.id
+    BulkTaskRunner(app)._process(job_id)
+    assert StubGenieACS.calls == []
@@ -0,0 +1,108 @@
+"""app.utils.circuit 的状态机用例"""
+import types
+import pytest
+import requests
+from app.utils import circuit
+from app.utils.circuit import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(circuit, 'time', types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(3, 30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(3, 30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_rejects_until_reset_timeout(clock):
+    breaker = CircuitBreaker(2, 30)
+    _open(breaker)
+    clock.value += 29.9
+    assert not breaker.allow()
+    clock.value += 0.1
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker(2, 30)
+    _open(breaker)
+    clock.value += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker(2, 30)
+    _open(breaker)
+    clock.value += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+    # 关闭后重新从零计数
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_probe_failure_reopens_and_restarts_timer(clock):
+    breaker = CircuitBreaker(5, 30)
+    _open(breaker)
+    clock.value += 30
+    assert breaker.allow()
+    # 半开状态下一次失败即重新打开，不必再累计到阈值
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.value += 29
+    assert not breaker.allow()
+    clock.value += 1
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_state_does_not_consume_probe(clock):
+    breaker = CircuitBreaker(1, 10)
+    _open(breaker)
+    clock.value += 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_disabled_breaker_always_allows(clock):
+    breaker = CircuitBreaker(0, 30)
+    for _ in range(100):
+        breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == CLOSED
+
+
+def test_open_error_is_connection_error():
+    # 已有的 NBI 错误处理按 ConnectionError 捕获
+    assert issubclass(CircuitOpenError, requests.exceptions.ConnectionError)
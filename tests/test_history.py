@@ -0,0 +1,195 @@
+"""app.utils.history 的环形缓冲区与可用率用例"""
+import random
+from datetime import datetime
+import pytest
+from app.utils import history as history_module
+from app.utils.history import StatusHistory, STATE_ONLINE, STATE_OFFLINE
+from app.utils.normalize import ONLINE_THRESHOLD_SECONDS
+
+T0 = 1_700_000_000
+
+
+def at(timestamp):
+    return datetime.utcfromtimestamp(timestamp)
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    """全网查询在安装 NumPy 时走向量化实现，两种实现都要覆盖"""
+    if request.param == 'numpy':
+        if history_module.np is None:
+            pytest.skip('NumPy 未安装')
+    else:
+        monkeypatch.setattr(history_module, 'np', None)
+    return request.param
+
+
+def make_history(transitions=32, informs=32, events=1000):
+    return StatusHistory(transitions, informs, events)
+
+
+def test_first_observation_records_no_transition():
+    history = make_history()
+    history.record('a', True, at(T0), T0)
+    result = history.device_history('a', T0, T0 + 10)
+    assert result['transitions'] == []
+    assert result['state'] == STATE_ONLINE
+    assert result['informs'] == [T0]
+
+
+def test_transition_times_come_from_inform():
+    history = make_history()
+    history.record('a', True, at(T0), T0)
+    # 离线时间为最后一次 Inform 加在线阈值，而不是观测到的时间
+    history.record('a', False, at(T0), T0 + 900)
+    history.record('a', True, at(T0 + 1000), T0 + 1100)
+    result = history.device_history('a', T0, T0 + 1200)
+    assert result['transitions'] == [(T0 + ONLINE_THRESHOLD_SECONDS, 0), (T0 + 1000, 1)]
+    assert result['availability'] == pytest.approx((600 + 200) / 1200)
+
+
+def test_offline_time_is_capped_at_now():
+    history = make_history()
+    history.record('a', True, at(T0), T0)
+    history.record('a', False, at(T0), T0 + 300)
+    assert history.device_history('a', T0, T0 + 400)['transitions'] == [(T0 + 300, 0)]
+
+
+def test_inform_gap_fills_missed_offline_period():
+    history = make_history()
+    history.record('a', True, at(T0), T0)
+    # 两次轮询之间离线后又上线，状态看起来没变，由 Inform 间隔补记
+    history.record('a', True, at(T0 + 2000), T0 + 2000)
+    result = history.device_history('a', T0, T0 + 2000)
+    assert result['transitions'] == [(T0 + ONLINE_THRESHOLD_SECONDS, 0), (T0 + 2000, 1)]
+
+
+def test_unknown_state_records_no_transition():
+    history = make_history()
+    history.record('a', None, None, T0)
+    history.record('a', True, at(T0 + 10), T0 + 10)
+    assert history.device_history('a', T0, T0 + 20)['transitions'] == []
+
+
+def test_transition_ring_wraps_around():
+    history = make_history(transitions=4)
+    history.record('a', True, at(T0), T0)
+    expected = []
+    now = T0
+    for step in range(5):
+        now += 1000
+        history.record('a', False, at(now - 1000), now)
+        expected.append((now - 1000 + ONLINE_THRESHOLD_SECONDS, 0))
+        now += 100
+        history.record('a', True, at(now), now)
+        expected.append((now, 1))
+    result = history.device_history('a', T0, now)
+    # 只保留最近 4 条，按时间顺序；窗口开始推迟到最早一条保留的记录
+    assert result['transitions'] == expected[-4:]
+    assert result['since'] == expected[-4][0]
+
+
+def test_inform_ring_wraps_around():
+    history = make_history(informs=3)
+    for offset in range(0, 500, 100):
+        history.record('a', True, at(T0 + offset), T0 + offset)
+    history.record('a', True, at(T0 + 400), T0 + 450)
+    assert history.device_history('a', T0, T0 + 500)['informs'] == [T0 + 200, T0 + 300, T0 + 400]
+
+
+def test_fleet_availability(backend):
+    history = make_history()
+    history.record('flappy', True, at(T0), T0)
+    history.record('up', True, at(T0), T0)
+    history.record('down', False, at(T0 - 5000), T0)
+    history.record('flappy', False, at(T0), T0 + 700)
+    history.record('up', True, at(T0 + 500), T0 + 700)
+    history.record('down', False, at(T0 - 5000), T0 + 700)
+    history.record('flappy', True, at(T0 + 1000), T0 + 1000)
+
+    result = history.availability(T0, T0 + 1200, limit=10)
+    assert result['devices'] == 3
+    assert result['always_online'] == 1
+    assert result['always_offline'] == 1
+    assert result['availability'] == pytest.approx((800 / 1200 + 1) / 3)
+    [(device_id, ratio, transitions)] = result['unstable']
+    assert device_id == 'flappy'
+    assert ratio == pytest.approx(800 / 1200)
+    assert transitions == 2
+
+
+def test_availability_matches_per_device_replay(backend):
+    rng = random.Random(7)
+    history = make_history(transitions=1000, events=100000)
+    devices = [f'd{i}' for i in range(40)]
+    informs = {device_id: T0 for device_id in devices}
+    for device_id in devices:
+        history.record(device_id, rng.random() < 0.5, at(T0), T0)
+    now = T0
+    for _ in range(60):
+        now += rng.randint(30, 400)
+        for device_id in devices:
+            if rng.random() < 0.5:
+                informs[device_id] = now - rng.randint(0, 30)
+            online = now - informs[device_id] <= ONLINE_THRESHOLD_SECONDS
+            history.record(device_id, online, at(informs[device_id]), now)
+
+    since = T0 + (now - T0) // 3
+    result = history.availability(since, now, limit=len(devices))
+    expected = {device_id: history.device_history(device_id, since, now)['availability'] for device_id in devices}
+    assert result['availability'] == pytest.approx(sum(expected.values()) / len(devices))
+    assert result['unstable']
+    for device_id, ratio, _ in result['unstable']:
+        assert ratio == pytest.approx(expected[device_id])
+    ratios = [ratio for _, ratio, _ in result['unstable']]
+    assert ratios == sorted(ratios)
+
+
+def test_flapping_counts_window_and_orders_by_count(backend):
+    history = make_history()
+    for device_id in ('a', 'b', 'c'):
+        history.record(device_id, True, at(T0), T0)
+    now = T0
+    for flaps, device_id in ((3, 'a'), (1, 'b'), (3, 'c')):
+        for _ in range(flaps):
+            now += 1000
+            history.record(device_id, True, at(now), now)
+    since, devices = history.flapping(T0, min_transitions=3, limit=10)
+    assert since == T0
+    # 每次补记产生离线、上线两条变化；次数相同时按首次记录的顺序
+    assert devices == [('a', 6), ('c', 6)]
+    assert history.flapping(now, min_transitions=1)[1] == [('c', 1)]
+
+
+def test_global_log_wraps_around(backend):
+    history = make_history(events=5)
+    history.record('a', True, at(T0), T0)
+    now = T0
+    for _ in range(4):
+        now += 1000
+        history.record('a', True, at(now), now)
+    # 共 8 条变化，全网日志只保留最近 5 条
+    assert history.flapping(T0, min_transitions=1)[1] == [('a', 5)]
+
+
+def test_removed_devices_are_excluded(backend):
+    history = make_history()
+    history.record('a', True, at(T0), T0)
+    history.record('b', True, at(T0), T0)
+    history.record('a', True, at(T0 + 1000), T0 + 1000)
+    history.remove('a')
+    assert history.device_history('a', T0, T0 + 1000) is None
+    assert history.flapping(T0, min_transitions=1)[1] == []
+    result = history.availability(T0, T0 + 1000)
+    assert result['devices'] == 1
+    assert result['always_online'] == 1
+    assert len(history) == 1
+
+
+def test_window_is_clamped_to_start_of_history():
+    history = make_history()
+    history.record('a', False, at(T0 - 5000), T0)
+    result = history.device_history('a', T0 - 86400, T0 + 100)
+    assert result['since'] == T0
+    assert result['state'] == STATE_OFFLINE
+    assert result['availability'] == 0
@@ -0,0 +1,123 @@
+"""app.utils.search 的 n-gram 索引用例"""
+import random
+import pytest
+from app.utils.search import DeviceSearchIndex, COMPACT_RATIO
+
+
+def device(device_id, serial=None, oui=None, product_class=None, manufacturer=None):
+    return {'_id': device_id, '_deviceId': {'_SerialNumber': serial, '_OUI': oui,
+                                            '_ProductClass': product_class, '_Manufacturer': manufacturer}}
+
+
+def ids(results):
+    return sorted(fields[0] for fields in results)
+
+
+@pytest.fixture
+def index():
+    index = DeviceSearchIndex(refresh_interval=30)
+    index.rebuild([
+        device('00259E-HG8245-ABC001', 'ABC001', '00259E', 'HG8245', 'Huawei'),
+        device('001E73-F660-XYZ002', 'XYZ002', '001E73', 'F660', 'ZTE'),
+        device('001E73-F660-XYZ003', 'XYZ003', '001E73', 'F660', 'ZTE'),
+    ])
+    return index
+
+
+def test_substring_match_is_case_insensitive(index):
+    assert ids(index.search('hg82')) == ['00259E-HG8245-ABC001']
+    assert ids(index.search('xyz00')) == ['001E73-F660-XYZ002', '001E73-F660-XYZ003']
+    assert ids(index.search('  Huawei ')) == ['00259E-HG8245-ABC001']
+
+
+def test_short_queries(index):
+    assert ids(index.search('Z')) == ['001E73-F660-XYZ002', '001E73-F660-XYZ003']
+    assert ids(index.search('03')) == ['001E73-F660-XYZ003']
+    assert index.search('') == []
+
+
+def test_no_match_across_fields(index):
+    # 序列号 ABC001 与 OUI 00259E 相邻，拼接处的 "00100" 不应匹配
+    assert index.search('00100') == []
+    assert index.search('nothing') == []
+
+
+def test_short_fields_match_short_queries():
+    index = DeviceSearchIndex(refresh_interval=30)
+    index.rebuild([device('DEVICE-1', 'Q', product_class='F6'), device('DEVICE-2', 'SNQ')])
+    assert ids(index.search('f6')) == ['DEVICE-1']
+    assert ids(index.search('q')) == ['DEVICE-1', 'DEVICE-2']
+
+
+def test_limit(index):
+    assert len(index.search('001e73', limit=1)) == 1
+
+
+def test_update_replaces_changed_fields(index):
+    docs = len(index._docs)
+    index.update([device('001E73-F660-XYZ002', 'XYZ002', '001E73', 'F660', 'ZTE')])
+    assert len(index._docs) == docs
+    index.update([device('001E73-F660-XYZ002', 'NEWSERIAL', '001E73', 'F660', 'ZTE')])
+    # 旧序列号仍是设备 ID 的一部分
+    assert ids(index.search('xyz002')) == ['001E73-F660-XYZ002']
+    assert ids(index.search('newserial')) == ['001E73-F660-XYZ002']
+    assert ids(index.search('xyz00')) == ['001E73-F660-XYZ002', '001E73-F660-XYZ003']
+    assert len(index) == 3
+
+
+def test_update_adds_new_devices(index):
+    index.update([device('NEW-1', 'QQQ999')])
+    assert ids(index.search('qqq')) == ['NEW-1']
+    assert len(index) == 4
+
+
+def test_remove(index):
+    index.remove(['001E73-F660-XYZ002', 'missing'])
+    assert ids(index.search('xyz')) == ['001E73-F660-XYZ003']
+    assert ids(index.search('z')) == ['001E73-F660-XYZ003']
+    assert len(index) == 2
+
+
+def test_remove_compacts_dead_documents():
+    index = DeviceSearchIndex(refresh_interval=30)
+    index.rebuild([device(f'DEV-{i:04d}', f'SN{i:04d}') for i in range(100)])
+    removed = [f'DEV-{i:04d}' for i in range(0, 100, 2)]
+    index.remove(removed[:int(100 * COMPACT_RATIO)])
+    assert len(index._docs) == 100
+    index.remove(removed[int(100 * COMPACT_RATIO):])
+    # 超过比例后重建，已删除的文档不再占用空间
+    assert len(index._docs) == 50
+    assert index._dead == 0
+    assert all(doc in index._by_device.values() for doc in range(50))
+    assert ids(index.search('sn00', limit=100)) == [f'DEV-{i:04d}' for i in range(1, 100, 2)]
+    assert index.search('dev-0002') == []
+    assert ids(index.search('dev-0003')) == ['DEV-0003']
+
+
+def test_matches_brute_force_after_random_updates_and_removals():
+    rng = random.Random(11)
+    alphabet = 'ABCDEF0123'
+
+    def random_device(device_id):
+        return device(device_id, ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 8))),
+                      rng.choice(['00259E', '001E73', None]), rng.choice(['HG8245', 'F6', None]), 'ZTE')
+
+    live = {f'D{i}': random_device(f'D{i}') for i in range(200)}
+    index = DeviceSearchIndex(refresh_interval=30)
+    index.rebuild(live.values())
+    for _ in range(30):
+        changed = [random_device(rng.choice(list(live)) if rng.random() < 0.7 else f'N{rng.random()}')
+                   for _ in range(10)]
+        index.update(changed)
+        live.update((d['_id'], d) for d in changed)
+        removed = rng.sample(sorted(live), 8)
+        index.remove(removed)
+        for device_id in removed:
+            del live[device_id]
+
+        for q in ['a', 'b0', 'abc', 'e3', 'f6', '001e', 'd1', 'ztE', 'hg8245', 'ab01c']:
+            expected = sorted(device_id for device_id, d in live.items()
+                              if any(value and q.lower() in value.lower()
+                                     for value in (device_id, *d['_deviceId'].values())))
+            assert ids(index.search(q, limit=10000)) == expected, q
+        assert len(index) == len(live)
@@ -0,0 +1,95 @@
+"""app.utils.streaming 的分块边界用例"""
+import json
+import pytest
+from app.utils import streaming
+from app.utils.streaming import _iter_array_stdlib, iter_json_array
+
+DOCUMENT = [
+    {'_id': '00259E-HG8245-001', 'name': '设备一', 'quote': 'a "quoted" \\ value\n'},
+    12345,
+    -1.5e-3,
+    0.25,
+    'plain string',
+    [1, [2, 3], {}],
+    True,
+    None,
+    {'nested': {'value': 42, 'list': []}},
+    7,
+]
+RAW = json.dumps(DOCUMENT, ensure_ascii=False).encode('utf-8')
+
+
+def _parse(chunks):
+    return list(_iter_array_stdlib(iter(chunks)))
+
+
+def _split(data, *positions):
+    bounds = (0,) + positions + (len(data),)
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def test_single_chunk():
+    assert _parse([RAW]) == DOCUMENT
+
+
+def test_one_byte_chunks():
+    # 每个字节一块：数字、字符串、转义符和多字节 UTF-8 字符都会被截断
+    assert _parse([RAW[i:i + 1] for i in range(len(RAW))]) == DOCUMENT
+
+
+@pytest.mark.parametrize('position', range(1, len(RAW)))
+def test_every_split_point(position):
+    assert _parse(_split(RAW, position)) == DOCUMENT
+
+
+@pytest.mark.parametrize('chunks, expected', [
+    ([b'[1.', b'5]'], [1.5]),
+    ([b'[12', b'34, 5', b'6]'], [1234, 56]),
+    ([b'[1e', b'3]'], [1000.0]),
+    ([b'[-', b'7]'], [-7]),
+    ([b'[7', b']'], [7]),
+    ([b'["a\\', b'"b"]'], ['a"b']),
+    ([b'["\\u00', b'e9"]'], ['é']),
+    (_split('["中文"]'.encode('utf-8'), 3), ['中文']),
+    (_split('["中文"]'.encode('utf-8'), 4), ['中文']),
+])
+def test_values_split_across_chunks(chunks, expected):
+    assert _parse(chunks) == expected
+
+
+@pytest.mark.parametrize('chunks', [[b''], [b'[]'], [b' \n[', b' ', b'\t]\n']])
+def test_empty(chunks):
+    assert _parse(chunks) == []
+
+
+def test_empty_chunks_between_data():
+    assert _parse([b'', b'[1', b'', b',', b'', b'2]', b'']) == [1, 2]
+
+
+@pytest.mark.parametrize('chunks', [[b'[1, 2'], [b'[{"a": 1}, {"b"'], [b'[1,', b' 2.']])
+def test_truncated_body_raises(chunks):
+    with pytest.raises(ValueError):
+        _parse(chunks)
+
+
+def test_not_an_array_raises():
+    with pytest.raises(ValueError):
+        _parse([b'{"_id": "x"}'])
+
+
+class _FakeResponse:
+    def __init__(self, data, chunk):
+        self.data = data
+        self.chunk = chunk
+
+    def iter_content(self, chunk_size):
+        return (self.data[i:i + self.chunk] for i in range(0, len(self.data), self.chunk))
+
+
+@pytest.mark.parametrize('use_ijson', [False, True])
+def test_iter_json_array(monkeypatch, use_ijson):
+    if use_ijson and streaming.ijson is None:
+        pytest.skip('ijson 未安装')
+    if not use_ijson:
+        monkeypatch.setattr(streaming, 'ijson', None)
+    assert list(iter_json_array(_FakeResponse(RAW, 7))) == DOCUMENT